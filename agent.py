@@ -1,17 +1,30 @@
+import asyncio
+import json
 import logging
+import os
+import random
 import re
-from typing import Any, Dict
+import time
+import uuid
+from contextlib import aclosing
+from typing import Any, Dict, Optional
 import textwrap
 
 import httpx
 from path import Path
-from pydash import py_
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
 
 from candidates import CandidateStore
 from jobs import JobStore
 from json_store import save_json_file
+from llm_cache import LLMCache, normalize_prompt
 from mcp_client import MCPClient
-from utils import parse_json_from_response
+from utils import CircuitBreaker, parse_json_from_response
 
 logger = logging.getLogger(__name__)
 
@@ -19,37 +32,206 @@ debug_dir = Path(__file__).dirname() / "debug"
 debug_dir.makedirs_p()
 
 job_store = JobStore()
-for job in job_store.get_list():
-    job["status"] = "unfilled"
-    if "candidate_ids" in job:
-        job["candidate_ids"] = []
-job_store.save()
-
 candidate_store = CandidateStore()
-for candidate in candidate_store.get_list():
-    candidate["status"] = "available"
-    candidate["messages"] = []
-candidate_store.save()
 
 mcp_chat_client = MCPClient("http://localhost:8080/sse", "ollama")
 
+llm_cache = LLMCache(debug_dir / "llm_cache.sqlite", ttl=600)
 
-state = {
-    "candidates": candidate_store.get_list(),
-    "jobs": job_store.get_list(),
-    "currentJob": None,
-    "currentMatches": [],
-    "matches": [],
-    "replies": [],
-}
+MAX_CONCURRENT_EMAILS = 5
 
+# Only the best skill matches are sent to the LLM for ranking
+SHORTLIST_SIZE = 20
 
-def get_state():
-    return state
+LLM_EMAILS = os.getenv("LLM_EMAILS", "").lower() in ("1", "true", "yes")
+
+PEOPLE_SERVER_URL = "http://127.0.0.1:8000"
+http_client: Optional[httpx.AsyncClient] = None
+people_server_breaker = CircuitBreaker("people_server")
+
+TOOLS_CACHE_TTL = 60
+tools_cache = {"ts": 0.0, "value": None}
+
+
+class AgentState:
+    """The agent's progress, with candidates and jobs read live from the stores."""
+
+    def __init__(self):
+        self.current_job = None
+        self.current_matches = []
+        self.matches = []
+        self.replies = []
+        self.poll_intervals = {}
+        # Bumped whenever any of the above changes
+        self.version = 0
+
+    @property
+    def candidates(self):
+        return candidate_store.get_list()
+
+    @property
+    def jobs(self):
+        return job_store.get_list()
+
+    def touch(self):
+        self.version += 1
 
+    def to_dict(self):
+        return {
+            "candidates": self.candidates,
+            "jobs": self.jobs,
+            "currentJob": self.current_job,
+            "currentMatches": self.current_matches,
+            "matches": self.matches,
+            "replies": self.replies,
+            "pollIntervals": self.poll_intervals,
+        }
+
+
+state = AgentState()
+replied_email_ids = set()
+n_emails_sent = 0
+
+
+def reset_stores():
+    for job in job_store.get_list():
+        job["status"] = "unfilled"
+        if "candidate_ids" in job:
+            job["candidate_ids"] = []
+    job_store.save()
 
-def get_tools():
-    return mcp_chat_client.get_tools()
+    for candidate in candidate_store.get_list():
+        candidate["status"] = "available"
+        candidate["messages"] = []
+    candidate_store.save()
+
+
+async def startup():
+    await asyncio.to_thread(reset_stores)
+
+
+def get_state():
+    return state.to_dict()
+
+
+def set_poll_interval(loop_name: str, interval: float):
+    if state.poll_intervals.get(loop_name) != interval:
+        state.poll_intervals[loop_name] = interval
+        state.touch()
+
+
+# The version counters restart at 0, so tie ETags to this process
+process_token = uuid.uuid4().hex[:8]
+
+
+def get_state_etag() -> str:
+    return (
+        f'"{process_token}-{state.version}-{candidate_store.version}'
+        f'-{job_store.version}"'
+    )
+
+
+async def get_tools():
+    now = time.monotonic()
+    if tools_cache["value"] and now - tools_cache["ts"] < TOOLS_CACHE_TTL:
+        return tools_cache["value"]
+    tools = await mcp_chat_client.refresh_tools()
+    tools_cache.update(ts=now, value=tools)
+    return tools
+
+
+def invalidate_tools_cache():
+    tools_cache.update(ts=0.0, value=None)
+
+
+def get_cache_key(
+    agent_tag: str, system: str, prompt: str, normalize: bool = False
+) -> str:
+    key_prompt = normalize_prompt(prompt) if normalize else prompt
+    return llm_cache.make_key(
+        agent_tag, mcp_chat_client.chat_client.model, system, key_prompt
+    )
+
+
+async def process_query_cached(
+    agent_tag: str, system: str, prompt: str, normalize: bool = False
+) -> str:
+    key = get_cache_key(agent_tag, system, prompt, normalize)
+    response = llm_cache.get(key)
+    if response is not None:
+        logger.info("%s: cache hit", agent_tag)
+        return response
+    response = await mcp_chat_client.process_query(prompt, system=system)
+    if response:
+        llm_cache.set(key, response)
+    return response
+
+
+# Static instructions are sent first as the system message, with the
+# per-call job/candidate/email data appended in the user message, so the
+# prompt prefix stays byte-identical across calls for provider prompt caching.
+FIND_CANDIDATES_SYSTEM = textwrap.dedent("""
+    From the candidates given by the user, give me 2 or 3 candidates
+    who are available for the job given by the user that have a good
+    match with skills.
+    Be really generous with the matching.
+    Return as formatted json list in the format:
+     [
+        {
+            "candidate_id": <candidate_id>,
+            "name": <candidate_name>,
+            "score": <score_as_percentage>,
+            "job_id": <job_id>,
+            "skills": [
+                "<candidate skill 1>",
+                "<candidate skill 2>",
+            ],
+            "reasons": [
+                "<reason 1>",
+                "<reason 2>",
+            ]
+        }
+    ]
+    Give reasons as short sentences.
+    Return an empty list if no candidates are available.
+    Otherwise return at most 3 items in the list.
+    Return as JSON only, and nothing else.
+    """)
+
+CREATE_EMAIL_SYSTEM = textwrap.dedent("""
+    Write a short (80 words) message to ask the candidate given by the user
+    if they would like the job given by the user.
+    Don't use tools. Do not use JSON.
+    Return the text message directly.
+    """)
+
+# Emails are filled from this template unless LLM_EMAILS is set
+EMAIL_TEMPLATE = textwrap.dedent("""\
+    Hi {name},
+
+    We have an opening for {title} that matches your background in {skills}.
+    Would you be interested? Reply to let us know.
+
+    Best,
+    Recruiter""")
+
+CLASSIFY_SYSTEM = textwrap.dedent("""
+    Classify the email given by the user in terms of: 'interested' or 'rejected'
+    Please return with a single word, and nothing else.
+    """)
+
+CLASSIFY_BATCH_SYSTEM = textwrap.dedent("""
+    The user gives a JSON list of emails with keys "email_id" and "text".
+    Classify each email in terms of: 'interested' or 'rejected'
+    Return as formatted json list in the format:
+    [
+        {
+            "email_id": <email_id>,
+            "classification": <classification>
+        }
+    ]
+    Return as JSON only, and nothing else.
+    """)
 
 
 async def find_candidates_agent(job):
@@ -57,44 +239,28 @@ async def find_candidates_agent(job):
     result = []
     response = ""
     try:
-        prompt = textwrap.dedent(f"""
-            Give me 2 or 3 candidates who are available for the jobs 
-            {job} that have a good match with skills.  
-            Be really generous with the matching. 
-            Return as formatted json list in the format:
-             [
-                {{
-                    "candidate_id": <candidate_id>,
-                    "name": <candidate_name>,
-                    "score": <score_as_percentage>,
-                    "job_id": <job_id>,
-                    "skills": [
-                        "<candidate skill 1>",
-                        "<candidate skill 2>",
-                    ],
-                    "reasons": [
-                        "<reason 1>",
-                        "<reason 2>",
-                    ]
-                }}
-            ]
-            Give reasons as short sentences.
-            Return an empty list if no candidates are available.
-            Otherwise return at most 3 items in the list.
-            Return as JSON only, and nothing else.
-            """)
-        response = await mcp_chat_client.process_query(prompt)
+        shortlist = [
+            {key: c.get(key) for key in ("candidate_id", "name", "skills", "status")}
+            for c in candidate_store.shortlist_for_job(job, SHORTLIST_SIZE)
+        ]
+        if not shortlist:
+            logger.info("find_candidates_agent: finish - no available candidates")
+            return result
+        prompt = f"Job: {json.dumps(job)}\nCandidates: {json.dumps(shortlist)}"
+        response = await process_query_cached(
+            "find_candidates", FIND_CANDIDATES_SYSTEM, prompt
+        )
         (debug_dir / "find_candidates.txt").write_text(response)
         matches = parse_json_from_response(response)
         if isinstance(matches, list):
             save_json_file(debug_dir / "find_candidates.json", matches)
             result = matches
         else:
-            logger.error(f"find_candidates_agent: Response is not a list - {matches}")
+            logger.error("find_candidates_agent: Response is not a list - %s", matches)
     except Exception as e:
-        logger.error(f"find_candidates_agent: {e}", exc_info=True)
+        logger.error("find_candidates_agent: %s", e, exc_info=True)
         logger.error(response)
-    logger.info(f"find_candidates_agent: finish - found {len(result)} candidates")
+    logger.info("find_candidates_agent: finish - found %s candidates", len(result))
     return result
 
 
@@ -102,15 +268,19 @@ async def create_email_agent(candidate, job):
     logger.info("create_email_agent: start")
     response = ""
     try:
-        prompt = textwrap.dedent(f"""
-            Write an short (80 words) message to ask {candidate['name']} 
-            if they would like a job {job}. 
-            Don't use tools. Do not use JSON.
-            Return the text message directly.
-            """)
-        response = await mcp_chat_client.process_query(prompt)
-        (debug_dir / "create_email.txt").write_text(response)
-        response = parse_json_from_response(response)
+        if LLM_EMAILS:
+            prompt = f"Candidate: {candidate['name']}\nJob: {json.dumps(job)}"
+            response = await process_query_cached(
+                "create_email", CREATE_EMAIL_SYSTEM, prompt
+            )
+            (debug_dir / "create_email.txt").write_text(response)
+            response = parse_json_from_response(response)
+        else:
+            response = EMAIL_TEMPLATE.format(
+                name=candidate["name"],
+                title=job.get("title", "a role"),
+                skills=", ".join(candidate.get("skills", [])[:3]),
+            )
         email_data = {
             "to": candidate.get("email"),
             "from": "recruiter@company.com",
@@ -119,142 +289,261 @@ async def create_email_agent(candidate, job):
         }
         save_json_file(debug_dir / "create_email.json", email_data)
     except Exception as e:
-        logger.error(f"Error parsing email data: {e}", exc_info=True)
+        logger.error("Error parsing email data: %s", e, exc_info=True)
         email_data = {}
-    logger.info(f"create_email_agent: finish\n---\n{str(response)}\n---")
+    logger.info("create_email_agent: finish\n---\n%s\n---", response)
     return email_data
 
 
+WORD_RE = re.compile(r"\b\w+\b|[^\w\s]")
+
+
 def get_word(text):
-    words = re.findall(r"\b\w+\b|[^\w\s]", text)
-    return words[0].lower() if words else ""
+    match = WORD_RE.search(text)
+    return match.group(0).lower() if match else ""
+
+
+CLASSIFICATIONS = ("interested", "rejected")
+
+
+async def stream_classification(prompt: str) -> str:
+    buffer = ""
+    word = ""
+    stream = mcp_chat_client.process_query_stream(prompt, system=CLASSIFY_SYSTEM)
+    async with aclosing(stream):
+        async for chunk in stream:
+            buffer += chunk
+            word = get_word(buffer)
+            if word in CLASSIFICATIONS:
+                break
+    (debug_dir / "classify_email.txt").write_text(buffer)
+    if len(buffer.split()) == 1 or word in CLASSIFICATIONS:
+        return word
+    return "not clear"
 
 
 async def classify_email_agent(message):
     logger.info("classify_email_agent: start")
     classification = "not clear"
     try:
-        prompt = textwrap.dedent(f"""
-            Classify the following email in terms of: 'interested' or 'rejected'
-            '{message}'
-            Please return with a single word, and nothing else.
-            """)
-        response = await mcp_chat_client.process_query(prompt)
-        response = parse_json_from_response(response)
-        response = str(response)
-        (debug_dir / "classify_email.txt").write_text(response)
-        if len(response.split()) == 1:
-            classification = get_word(response)
+        prompt = f"'{message}'"
+        key = get_cache_key("classify_email", CLASSIFY_SYSTEM, prompt, normalize=True)
+        cached = llm_cache.get(key)
+        if cached is not None:
+            logger.info("classify_email: cache hit")
+            classification = cached
+        else:
+            classification = await stream_classification(prompt)
+            if classification in CLASSIFICATIONS:
+                llm_cache.set(key, classification)
     except Exception as e:
-        logger.error(f"Error classifying email: {e}", exc_info=True)
-    logger.info(f"---\n{message}\n---")
-    logger.info(f"classify_email_agent: finish `{classification}`")
+        logger.error("Error classifying email: %s", e, exc_info=True)
+    logger.info("---\n%s\n---", message)
+    logger.info("classify_email_agent: finish `%s`", classification)
     return classification
 
 
-async def check_jobs():
-    global state
+async def classify_emails_agent(emails) -> Dict[str, str]:
+    """Classifies several email replies in one call.
 
-    logger.info("check_jobs: start")
+    Returns a map of str(email_id) to classification. Emails missing from
+    the map, or the whole batch if the response can't be parsed, should be
+    classified individually with classify_email_agent.
+    """
+    logger.info("classify_emails_agent: start - %s emails", len(emails))
+    result = {}
+    try:
+        prompt = json.dumps(
+            [{"email_id": e["email_id"], "text": e["response"]["text"]} for e in emails]
+        )
+        response = await process_query_cached(
+            "classify_emails", CLASSIFY_BATCH_SYSTEM, prompt
+        )
+        (debug_dir / "classify_emails.txt").write_text(response)
+        items = parse_json_from_response(response)
+        if isinstance(items, list):
+            for item in items:
+                if not isinstance(item, dict):
+                    continue
+                word = get_word(str(item.get("classification", "")))
+                if word in CLASSIFICATIONS:
+                    result[str(item.get("email_id"))] = word
+        else:
+            logger.error("classify_emails_agent: Response is not a list - %s", items)
+    except Exception as e:
+        logger.error("Error classifying emails: %s", e, exc_info=True)
+    logger.info("classify_emails_agent: finish - classified %s emails", len(result))
+    return result
 
-    job = py_.sample(state["jobs"])
-    state["currentMatches"] = []
-    state["currentJob"] = job
-    n_sent = 0
 
-    for match in await find_candidates_agent(job):
+async def process_match(match, job, semaphore: asyncio.Semaphore) -> bool:
+    async with semaphore:
         try:
-            candidate = py_.find(
-                state["candidates"], lambda c: c["name"] == match.get("name")
-            )
+            candidate = candidate_store.get_by_name(match.get("name"))
             if not candidate:
-                continue
-            state["currentMatches"].insert(0, match)
-            state["matches"].insert(0, match)
+                return False
+            state.current_matches.insert(0, match)
+            state.matches.insert(0, match)
+            state.touch()
 
             email_data = await create_email_agent(candidate, job)
             match["sent_email"] = email_data
+            state.touch()
 
-            candidate_store.add_message(candidate["candidate_id"], email_data)
-            candidate_store.update_candidate_status(
+            await candidate_store.add_message(candidate["candidate_id"], email_data)
+            await candidate_store.update_candidate_status(
                 candidate["candidate_id"], "requested", job["job_id"]
             )
             await send_email(candidate, email_data)
-
-            state["candidates"] = candidate_store.get_list()
-            n_sent += 1
+            return True
         except Exception as e:
-            logger.error(f"Error sending email: {e}", exc_info=True)
+            logger.error("Error sending email: %s", e, exc_info=True)
+            return False
 
-    logger.info(f"check_jobs: finish - sent emails to {n_sent} candidates")
 
+async def check_jobs():
+    global n_emails_sent
 
-async def check_candidates_replies():
-    global state
+    logger.info("check_jobs: start")
 
+    jobs = state.jobs
+    job = random.choice(jobs) if jobs else None
+    state.current_matches = []
+    state.current_job = job
+    state.touch()
+
+    matches = await find_candidates_agent(job)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_EMAILS)
+    results = await asyncio.gather(
+        *[process_match(match, job, semaphore) for match in matches]
+    )
+    n_sent = sum(results)
+    n_emails_sent += n_sent
+
+    logger.info("check_jobs: finish - sent emails to %s candidates", n_sent)
+    return n_sent
+
+
+async def check_candidates_replies():
     logger.info("check_candidates_replies: start")
+    pending = []
     for email in await read_emails():
         email_id = email["email_id"]
-        processed_email = py_.find(
-            state["replies"], lambda r: r["email"]["email_id"] == email_id
-        )
-        if processed_email:
+        if email_id in replied_email_ids:
+            continue
+        if not (email.get("response") or {}).get("text"):
             continue
-        if not py_.get(email, "response.text"):
+        candidate = candidate_store.get_by_id(email["candidate_id"])
+        if not candidate:
             continue
+        # show empty classification
+        replied_email_ids.add(email_id)
+        reply = {
+            "candidate": candidate,
+            "email": email,
+            "classification": "",
+            "jobId": candidate["job_id"],
+        }
+        state.replies.insert(0, reply)
+        state.touch()
+        pending.append(reply)
+
+    classifications = {}
+    if len(pending) > 1:
+        classifications = await classify_emails_agent([r["email"] for r in pending])
+
+    for reply in pending:
+        email = reply["email"]
         candidate_id = email["candidate_id"]
-        candidate = py_.find(
-            state["candidates"],
-            lambda c: c["candidate_id"] == candidate_id,
-        )
-        job_id = candidate["job_id"]
+        job_id = reply["jobId"]
         try:
-            # show empty classification
-            state["replies"].insert(
-                0,
-                {
-                    "candidate": candidate,
-                    "email": email,
-                    "classification": '',
-                    "jobId": job_id,
-                },
-            )
-            classification = await classify_email_agent(email["response"]["text"])
+            classification = classifications.get(str(email["email_id"]))
+            if classification is None:
+                classification = await classify_email_agent(email["response"]["text"])
 
             # now show classification
-            state["replies"][0]['classification'] = classification
+            reply["classification"] = classification
+            state.touch()
 
             available = "interested" in classification.lower()
-            job_store.update_job_availability(job_id, available, candidate_id)
-
-            state["jobs"] = job_store.get_list()
-
-            candidate_store.add_message(candidate_id, email)
-            state["candidates"] = candidate_store.get_list()
+            await job_store.update_job_availability(job_id, available, candidate_id)
+            await candidate_store.add_message(candidate_id, email)
         except Exception as e:
-            logger.error(f"Error classifying email: {e}", exc_info=True)
+            logger.error("Error classifying email: %s", e, exc_info=True)
     logger.info("check_candidates_replies: finish")
+    return len(pending)
+
+
+async def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None or http_client.is_closed:
+        http_client = httpx.AsyncClient(
+            base_url=PEOPLE_SERVER_URL,
+            timeout=10.0,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        )
+    return http_client
+
+
+async def close_http_client():
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+
+def is_server_failure(e: BaseException) -> bool:
+    """Transport errors and 5xx; a 4xx means the server is up but the request was bad."""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
+
+
+def is_retryable(e: BaseException) -> bool:
+    if isinstance(e, httpx.ReadTimeout) and e.request.method == "POST":
+        # The server may already have acted on it, e.g. sent the email
+        return False
+    return is_server_failure(e)
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.2, max=5),
+    retry=retry_if_exception(is_retryable),
+    reraise=True,
+)
+async def request_people_server(method: str, url: str, **kwargs) -> httpx.Response:
+    people_server_breaker.check()
+    client = await get_http_client()
+    try:
+        response = await client.request(method, url, **kwargs)
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        if is_server_failure(e):
+            people_server_breaker.record_failure()
+        else:
+            people_server_breaker.record_success()
+        raise
+    people_server_breaker.record_success()
+    return response
 
 
 async def send_email(candidate: Dict[str, Any], email_data: Dict[str, str]) -> bool:
     try:
-        url = f"http://127.0.0.1:8000/send-email"
         headers = {"Content-Type": "application/json"}
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=email_data, headers=headers)
-            response.raise_for_status()
-            return True
+        await request_people_server(
+            "POST", "/send-email", json=email_data, headers=headers
+        )
+        return True
     except Exception as e:
-        logger.error(f"Error sending email: {e}", exc_info=True)
+        logger.error("Error sending email: %s", e, exc_info=True)
         return False
 
 
 async def read_emails():
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get("http://127.0.0.1:8000/emails")
-            response.raise_for_status()
-            return response.json()
+        response = await request_people_server("GET", "/emails")
+        return response.json()
     except Exception as e:
-        logger.error(f"Error reading emails: {e}", exc_info=True)
+        logger.error("Error reading emails: %s", e, exc_info=True)
         return []
@@ -3,12 +3,14 @@ import logging
 from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.responses import FileResponse
 from path import Path
 from rich.logging import RichHandler
 
 import agent
+from chat_client import close_chat_clients
+from utils import ORJSONResponse
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,28 +24,61 @@ logger = logging.getLogger(__name__)
 app = FastAPI()
 
 
+IDLE_CYCLES_BEFORE_BACKOFF = 2
+
+
+def get_poll_interval(
+    interval: float, idle_cycles: int, base: float, cap: float
+) -> float:
+    """Doubles the interval, up to cap, once a loop has been idle for a while."""
+    if idle_cycles < IDLE_CYCLES_BEFORE_BACKOFF:
+        return base
+    return min(interval * 2, cap)
+
+
 async def check_jobs_loop(stop_event: asyncio.Event):
     logger.info("check_jobs_loop: init")
+    interval = 3
+    idle_cycles = 0
     while not stop_event.is_set():
         try:
-            await agent.check_jobs()
+            n_sent = await agent.check_jobs()
+            idle_cycles = 0 if n_sent else idle_cycles + 1
         except Exception as e:
-            logger.error(f"Error in job checking loop: {str(e)}", exc_info=True)
+            logger.error("Error in job checking loop: %s", e, exc_info=True)
+        interval = get_poll_interval(interval, idle_cycles, 3, 60)
+        agent.set_poll_interval("checkJobs", interval)
+        timeout = interval
+        if agent.people_server_breaker.is_open:
+            timeout = max(interval, agent.people_server_breaker.reset_timeout)
         try:
-            await asyncio.wait_for(stop_event.wait(), timeout=3)
+            await asyncio.wait_for(stop_event.wait(), timeout=timeout)
         except asyncio.TimeoutError:
             pass
 
 
 async def check_email_replies_loop(stop_event: asyncio.Event):
     logger.info("check_email_replies_loop: init")
+    interval = 10
+    idle_cycles = 0
+    n_emails_sent = agent.n_emails_sent
     while not stop_event.is_set():
         try:
-            await agent.check_candidates_replies()
+            n_replies = await agent.check_candidates_replies()
+            idle_cycles = 0 if n_replies else idle_cycles + 1
+            # new outgoing emails mean replies may be on their way
+            if agent.n_emails_sent != n_emails_sent:
+                n_emails_sent = agent.n_emails_sent
+                idle_cycles = 0
         except Exception as e:
-            logger.error(f"Error in email replies loop: {str(e)}", exc_info=True)
+            logger.error("Error in email replies loop: %s", e, exc_info=True)
+        interval = get_poll_interval(interval, idle_cycles, 10, 120)
+        agent.set_poll_interval("checkEmailReplies", interval)
+        timeout = interval
+        if agent.people_server_breaker.is_open:
+            timeout = max(interval, agent.people_server_breaker.reset_timeout)
         try:
-            await asyncio.wait_for(stop_event.wait(), timeout=10)
+            await asyncio.wait_for(stop_event.wait(), timeout=timeout)
         except asyncio.TimeoutError:
             pass
 
@@ -51,12 +86,15 @@ async def check_email_replies_loop(stop_event: asyncio.Event):
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting application...")
+    await agent.startup()
     stop_event = asyncio.Event()
 
     # Start background tasks
     tasks = [
         asyncio.create_task(check_jobs_loop(stop_event)),
         asyncio.create_task(check_email_replies_loop(stop_event)),
+        asyncio.create_task(agent.candidate_store.run_autosave(stop_event)),
+        asyncio.create_task(agent.job_store.run_autosave(stop_event)),
     ]
 
     logger.info("Background tasks started")
@@ -67,10 +105,12 @@ async def lifespan(app: FastAPI):
         logger.info("Shutting down application...")
         stop_event.set()
         await asyncio.gather(*tasks, return_exceptions=True)
+        await agent.close_http_client()
+        await close_chat_clients()
         logger.info("Background tasks stopped")
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 @app.get("/")
@@ -86,9 +126,12 @@ async def get_tools():
 
 
 @app.get("/state")
-async def get_state():
+async def get_state(request: Request):
     logger.debug("Fetching application state")
-    return agent.get_state()
+    etag = agent.get_state_etag()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return ORJSONResponse(agent.get_state(), headers={"ETag": etag})
 
 
 if __name__ == "__main__":
@@ -1,48 +1,111 @@
 import logging
 import random
-from typing import Literal, Optional
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Literal, Optional, Set, TypedDict, Union
 
 from path import Path
 from rich.logging import RichHandler
 from rich.pretty import pretty_repr
 
-from json_store import JsonListStore, load_json_file
+from json_store import JsonListStore, load_json_file_cached
 
 logger = logging.getLogger(__name__)
 
 CandidateStatus = Literal["available", "requested", "unavailable", "assigned"]
 
 
-class CandidateStore(JsonListStore[dict]):
+class Candidate(TypedDict, total=False):
+    candidate_id: int
+    name: str
+    email: str
+    phone: str
+    status: CandidateStatus
+    skills: List[str]
+    job_id: Optional[str]
+    messages: List[Any]
+
+
+class CandidateStore(JsonListStore[Candidate]):
+    _index_field = "candidate_id"
+
     def __init__(self, json_file: str = None):
+        self._skill_index: Dict[str, Set[Any]] = {}
         if json_file is None:
             json_file = Path(__file__).parent / "candidates.json"
         super().__init__(json_file)
 
-    def update_candidate_status(
+    def load(self, filepath: Union[str, Path] = None) -> None:
+        super().load(filepath)
+        self._skill_index = defaultdict(set)
+        self._add_to_skill_index(self.data)
+
+    def append(self, item: Candidate) -> None:
+        super().append(item)
+        self._add_to_skill_index([item])
+
+    def extend(self, items: List[Candidate]) -> None:
+        super().extend(items)
+        self._add_to_skill_index(items)
+
+    def clear(self) -> None:
+        self._skill_index = defaultdict(set)
+        super().clear()
+
+    def _add_to_skill_index(self, items: List[Candidate]) -> None:
+        for c in items:
+            for skill in c.get("skills", []):
+                self._skill_index[skill.lower()].add(c["candidate_id"])
+
+    def get_by_name(self, name: str) -> Optional[Candidate]:
+        return self.get_single("name", name)
+
+    def get_by_id(self, candidate_id: Any) -> Optional[Candidate]:
+        return self.get_single("candidate_id", candidate_id)
+
+    def shortlist_for_job(self, job: dict, k: int = 20) -> List[Candidate]:
+        """Returns up to k available candidates, ranked by skills shared with job."""
+        self.reload_if_changed()
+        skills = job.get("skills") if job else None
+        if not isinstance(skills, list) or not skills:
+            return [c for c in self.data if c.get("status") == "available"][:k]
+        scores = Counter()
+        for skill in skills:
+            for candidate_id in self._skill_index.get(str(skill).lower(), ()):
+                scores[candidate_id] += 1
+        shortlist = []
+        for candidate_id, _ in scores.most_common():
+            candidate = self._index[candidate_id]
+            if candidate.get("status") == "available":
+                shortlist.append(candidate)
+                if len(shortlist) >= k:
+                    break
+        return shortlist
+
+    async def update_candidate_status(
         self, candidate_id: str, status: CandidateStatus, job_id: Optional[str] = None
     ) -> bool:
-        candidate = self.get_single("candidate_id", candidate_id)
+        candidate = self.get_by_id(candidate_id)
         if candidate:
             candidate["status"] = status
             candidate["job_id"] = job_id
-            self.save()
+            await self.asave()
             return True
         return False
 
-    def add_message(self, candidate_id: str, message: any) -> bool:
-        candidate = self.get_single("candidate_id", candidate_id)
+    async def add_message(self, candidate_id: str, message: any) -> bool:
+        candidate = self.get_by_id(candidate_id)
         if candidate:
             if "messages" not in candidate:
                 candidate["messages"] = []
             candidate["messages"].append(message)
-            self.save()
+            await self.asave()
             return True
         return False
 
     def generate_fake_candidates(self):
         self.clear()
-        people = load_json_file("people.json")
+        people = load_json_file_cached("people.json")
+        candidates = []
         for person in people:
             skills = random.sample(
                 [
@@ -59,7 +122,7 @@ class CandidateStore(JsonListStore[dict]):
                 ],
                 k=random.randint(3, 6),
             )
-            candidate = {
+            candidate: Candidate = {
                 "candidate_id": person["candidate_id"],
                 "name": person["name"],
                 "email": person["email"],
@@ -68,7 +131,8 @@ class CandidateStore(JsonListStore[dict]):
                 "skills": skills,
                 "job_id": None,
             }
-            self.data.append(candidate)
+            candidates.append(candidate)
+        self.extend(candidates)
         self.save()
 
 
@@ -82,5 +146,6 @@ if __name__ == "__main__":
     store = CandidateStore()
     store.generate_fake_candidates()
     candidates = store.get_list()
-    logger.info(f"Loaded {len(candidates)} candidates")
-    logger.debug(pretty_repr(candidates))
+    logger.info("Loaded %s candidates", len(candidates))
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(pretty_repr(candidates))
@@ -1,24 +1,44 @@
 import asyncio
+import functools
 import os
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from contextlib import nullcontext
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
 
-import ollama
+import httpx
 from dotenv import load_dotenv
-from openai import OpenAI
-from openai.types.chat import (
-    ChatCompletionAssistantMessageParam,
-    ChatCompletionSystemMessageParam,
-    ChatCompletionToolMessageParam,
-    ChatCompletionToolParam,
-    ChatCompletionUserMessageParam,
-)
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletionMessageParam, ChatCompletionToolParam
 
 load_dotenv()
 
 
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=64, max_connections=128)
+
+chat_clients: Dict[tuple, "IChatClient"] = {}
+
+
 def get_chat_client(client_type: str, **kwargs) -> "IChatClient":
-    client_type = client_type.lower()
+    """Returns a shared chat client, one per client type and arguments.
+
+    Reusing the client keeps its HTTP connection pool alive across callers.
+    """
+    key = (client_type.lower(), tuple(sorted(kwargs.items())))
+    if key not in chat_clients:
+        chat_clients[key] = _make_chat_client(key[0], **kwargs)
+    return chat_clients[key]
+
+
+async def close_chat_clients() -> None:
+    """Closes the connection pools of all shared chat clients."""
+    clients = list(chat_clients.values())
+    chat_clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def _make_chat_client(client_type: str, **kwargs) -> "IChatClient":
     if client_type == "openai":
         return OpenAIChatClient(**kwargs)
     if client_type == "ollama":
@@ -26,6 +46,14 @@ def get_chat_client(client_type: str, **kwargs) -> "IChatClient":
     raise ValueError(f"Unknown chat client type: {client_type}")
 
 
+@functools.lru_cache(maxsize=4096)
+def _wc(content: str) -> int:
+    """Word count of a message, cached since chat histories resend the same text."""
+    # str.split runs in C and its list is freed at once; a per-character
+    # Python loop or regex scan measured several times slower
+    return len(content.split())
+
+
 class IChatClient(ABC):
     @abstractmethod
     async def get_completion(
@@ -39,11 +67,50 @@ class IChatClient(ABC):
     def get_token_cost(self) -> float:
         pass
 
+    async def aclose(self) -> None:
+        pass
+
+    async def get_completion_batch(
+        self,
+        messages_list: List[List[Dict[str, Any]]],
+        max_concurrency: Optional[int] = None,
+    ) -> List[Any]:
+        """Runs several conversations at once over this client's connection pool.
+
+        Neither backend accepts distinct prompts in one request, so the batch is
+        sent as concurrent requests. Failed items come back as exceptions.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def complete(messages):
+            async with semaphore or nullcontext():
+                return await self.get_completion(messages)
+
+        return await asyncio.gather(
+            *[complete(messages) for messages in messages_list],
+            return_exceptions=True,
+        )
+
+    async def stream_completion(
+        self, messages: List[Dict[str, Any]]
+    ) -> AsyncIterator[str]:
+        """Yields the response text in chunks; falls back to a single chunk."""
+        response = await self.get_completion(messages)
+        yield response["text"]
+
 
 class OllamaChatClient(IChatClient):
     def __init__(self, model: str = "llama3.2"):
+        # Vendor SDKs are imported on first use, so each process only pays
+        # for the one it actually talks to
+        import ollama
+
         self.model = model
-        self.client = ollama.AsyncClient()
+        self.client = ollama.AsyncClient(limits=HTTP_LIMITS)
+        # Match the server's OLLAMA_NUM_PARALLEL so extra requests wait here
+        # instead of queueing inside ollama
+        num_parallel = os.getenv("OLLAMA_NUM_PARALLEL")
+        self.semaphore = asyncio.Semaphore(int(num_parallel)) if num_parallel else None
 
     async def get_completion(
         self,
@@ -51,29 +118,26 @@ class OllamaChatClient(IChatClient):
         tools: Optional[List[Dict[str, Any]]] = None,
     ) -> Dict[str, Any]:
         try:
-            response = await self.client.chat(
-                model=self.model,
-                messages=messages,
-                tools=tools if tools else None,
-            )
+            async with self.semaphore or nullcontext():
+                response = await self.client.chat(
+                    model=self.model,
+                    messages=messages,
+                    tools=tools if tools else None,
+                )
 
-            tool_calls = []
-            if (
-                hasattr(response, "message")
-                and hasattr(response.message, "tool_calls")
-                and response.message.tool_calls
-            ):
-                tool_calls = [call.model_dump() for call in response.message.tool_calls]
-
-            response_text = (
-                getattr(response.message, "content", "")
-                if hasattr(response, "message")
-                else ""
-            )
+            try:
+                message = response.message
+                response_text = message.content or ""
+                tool_calls = [
+                    call.model_dump(exclude_unset=True)
+                    for call in message.tool_calls or ()
+                ]
+            except AttributeError:
+                response_text = ""
+                tool_calls = []
 
-            token_count = sum(
-                len(m.get("content", "").split()) for m in messages
-            ) + len(response_text.split())
+            prompt_count = sum(_wc(m.get("content", "")) for m in messages)
+            token_count = prompt_count + _wc(response_text)
 
             result = {
                 "text": response_text,
@@ -86,66 +150,77 @@ class OllamaChatClient(IChatClient):
             return result
 
         except Exception as e:
+            # Raise like the OpenAI client, so callers never mistake the error
+            # for model output and e.g. cache it
             print(f"Error calling Ollama: {e}")
-            return {
-                "text": f"Error: {str(e)}",
-                "tool_calls": [],
-                "metadata": {
-                    "Usage": {"TotalTokenCount": 0},
-                    "model": self.model,
-                },
-            }
+            raise
+
+    async def stream_completion(
+        self, messages: List[Dict[str, Any]]
+    ) -> AsyncIterator[str]:
+        # Hold the slot until the stream ends, as ollama is busy until then
+        async with self.semaphore or nullcontext():
+            stream = await self.client.chat(
+                model=self.model, messages=messages, stream=True
+            )
+            try:
+                async for part in stream:
+                    if part.message.content:
+                        yield part.message.content
+            finally:
+                await stream.aclose()
 
     def get_token_cost(self) -> float:
         return 0.0
 
+    async def aclose(self) -> None:
+        await self.client.close()
+
+
+MESSAGE_ROLES = frozenset({"system", "user", "assistant", "tool"})
+
 
 class OpenAIChatClient(IChatClient):
     def __init__(self, model: str = "o4-mini"):
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is not set.")
-        self.client = OpenAI(api_key=api_key)
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            http_client=DefaultAsyncHttpxClient(limits=HTTP_LIMITS),
+        )
         self.model = model
 
     @staticmethod
-    def convert_message(msg: Dict[str, Any]):
+    def convert_message(msg: Dict[str, Any]) -> "ChatCompletionMessageParam":
+        # The SDK takes plain dicts, so messages pass through once the role checks out
         role = msg.get("role")
-        content = msg.get("content", "")
-        if role == "system":
-            return ChatCompletionSystemMessageParam(role=role, content=content)
-        elif role == "user":
-            return ChatCompletionUserMessageParam(role=role, content=content)
-        elif role == "assistant":
-            return ChatCompletionAssistantMessageParam(
-                role=role,
-                content=content,
-                tool_calls=msg.get("tool_calls"),
-            )
-        elif role == "tool":
-            return ChatCompletionToolMessageParam(
-                role=role,
-                content=content,
-                tool_call_id=msg.get("tool_call_id"),
-            )
-        else:
+        if role not in MESSAGE_ROLES:
             raise ValueError(f"Unsupported message role: {role}")
+        return msg
 
     @staticmethod
     def convert_tools(
         tools: Optional[List[Dict[str, Any]]],
-    ) -> Optional[List[ChatCompletionToolParam]]:
+    ) -> Optional[List["ChatCompletionToolParam"]]:
         if not tools:
             return None
+        if all(
+            tool.get("type") == "function" and "parameters" in tool["function"]
+            for tool in tools
+        ):
+            return list(tools)
         return [
-            ChatCompletionToolParam(
-                type="function",
-                function={
+            {
+                "type": "function",
+                "function": {
                     "name": tool["function"]["name"],
                     "description": tool["function"].get("description", ""),
                     "parameters": tool["function"].get("parameters", {}),
                 },
-            )
+            }
             for tool in tools
         ]
 
@@ -154,22 +229,19 @@ class OpenAIChatClient(IChatClient):
         messages: List[Dict[str, Any]],
         tools: Optional[List[Dict[str, Any]]] = None,
     ) -> Dict[str, Any]:
-        def sync_call():
-            return self.client.chat.completions.create(
-                model=self.model,
-                messages=[self.convert_message(msg) for msg in messages],
-                tools=self.convert_tools(tools),
-            )
-
-        loop = asyncio.get_event_loop()
-        completion = await loop.run_in_executor(None, sync_call)
-        message = completion.choices[0].message if completion.choices else {}
-        text = message.content if hasattr(message, "content") else ""
+        openai_messages = [self.convert_message(msg) for msg in messages]
+        openai_tools = self.convert_tools(tools)
+        completion = await self.client.chat.completions.create(
+            model=self.model, messages=openai_messages, tools=openai_tools
+        )
         token_count = completion.usage.total_tokens if completion.usage else None
-
-        tool_calls = []
-        if hasattr(message, "tool_calls") and message.tool_calls:
-            tool_calls = [call.to_dict() for call in message.tool_calls]
+        try:
+            message = completion.choices[0].message
+            text = message.content
+            tool_calls = [call.to_dict() for call in message.tool_calls or ()]
+        except (AttributeError, IndexError):
+            text = ""
+            tool_calls = []
 
         return {
             "text": text,
@@ -187,3 +259,6 @@ class OpenAIChatClient(IChatClient):
             "gpt-3.5-turbo": 0.002,  # $0.002 per 1K tokens
         }
         return pricing.get(self.model.lower(), 0.0)
+
+    async def aclose(self) -> None:
+        await self.client.close()
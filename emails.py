@@ -1,5 +1,5 @@
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from path import Path
 
@@ -10,15 +10,32 @@ logger = logging.getLogger(__name__)
 
 
 class EmailStore(JsonListStore[Dict[str, Any]]):
+    _index_field = "email_id"
+    _json_lines = True
+
     def __init__(self, filename: str = None):
+        self._max_id = 0
+        # candidate_id never changes once sent, so this survives edits to emails
+        self._by_candidate: Dict[Any, List[Dict[str, Any]]] = {}
         if filename is None:
-            filename = Path(__file__).parent / "emails.json"
+            filename = Path(__file__).parent / "emails.jsonl"
         super().__init__(filename)
 
+    def load(self, filepath: Union[str, Path] = None) -> None:
+        super().load(filepath)
+        self._max_id = max((c.get("email_id", 0) for c in self.data), default=0)
+        self._by_candidate = {}
+        for email in self.data:
+            self._by_candidate.setdefault(email.get("candidate_id"), []).append(email)
+
+    def clear(self) -> None:
+        self._max_id = 0
+        self._by_candidate = {}
+        super().clear()
+
     def _get_next_email_id(self) -> int:
-        if not self.data:
-            return 1
-        return max(c.get("email_id", 0) for c in self.data) + 1
+        self._max_id += 1
+        return self._max_id
 
     def send_email_by_candidate_id(
         self,
@@ -28,7 +45,7 @@ class EmailStore(JsonListStore[Dict[str, Any]]):
         subject: str,
         message: str,
     ) -> Dict[str, Any]:
-        logger.info(f"Sending email to candidate {candidate_id} at {to_email}")
+        logger.info("Sending email to candidate %s at %s", candidate_id, to_email)
         email_entry = {
             "email_id": self._get_next_email_id(),
             "candidate_id": candidate_id,
@@ -40,9 +57,9 @@ class EmailStore(JsonListStore[Dict[str, Any]]):
             "response": None,
             "read": False,
         }
-        self.data.append(email_entry)
-        self.save()
-        logger.info(f"Email sent to {to_email} (ID: {email_entry['email_id']})")
+        self.save_append(email_entry)
+        self._by_candidate.setdefault(candidate_id, []).append(email_entry)
+        logger.info("Email sent to %s (ID: %s)", to_email, email_entry["email_id"])
         return email_entry
 
     def mark_email_as_read(self, email_id: int) -> Optional[Dict[str, Any]]:
@@ -50,28 +67,32 @@ class EmailStore(JsonListStore[Dict[str, Any]]):
         if email:
             if not email["read"]:
                 email["read"] = True
-                self.save()
-                logger.info(f"Marked email {email_id} as read")
+                self.save_item(email)
+                logger.info("Marked email %s as read", email_id)
             else:
-                logger.debug(f"Email {email_id} was already marked as read")
+                logger.debug("Email %s was already marked as read", email_id)
             return email
-        logger.warning(f"Attempted to mark non-existent email {email_id} as read")
+        logger.warning("Attempted to mark non-existent email %s as read", email_id)
         return None
 
     def save_response(self, email_id: int, reply_text: str) -> Optional[Dict[str, Any]]:
         email = self.get_single("email_id", email_id)
         if email:
-            logger.info(f"Saving response to email {email_id}")
+            logger.info("Saving response to email %s", email_id)
             email["response"] = {
                 "text": reply_text,
                 "timestamp": _current_timestamp(),
             }
             email["read"] = True
-            self.save()
-            logger.debug(f"Response saved for email {email_id}")
+            self.save_item(email)
+            logger.debug("Response saved for email %s", email_id)
             return email
-        logger.warning(f"Attempted to save response to non-existent email {email_id}")
+        logger.warning("Attempted to save response to non-existent email %s", email_id)
         return None
 
+    def get_by_candidate(self, candidate_id: Any) -> List[Dict[str, Any]]:
+        self.reload_if_changed()
+        return list(self._by_candidate.get(candidate_id, []))
+
     def get_emails_by_from(self, email: str) -> List[Dict[str, Any]]:
         return self.get_list("from", email)
@@ -3,34 +3,80 @@ import logging
 import os
 import random
 import string
-from typing import Any, Dict, Optional, Set
+from typing import Any, AsyncIterator, Dict, Optional, Set
 
 from path import Path
 from rich.logging import RichHandler
 from rich.pretty import pretty_repr
 
-from json_store import JsonListStore, load_json_file
+from json_store import JsonListStore, load_json_file_cached
 from utils import parse_json_from_response
 
 logger = logging.getLogger(__name__)
 
+TITLE_PROMPT = (
+    "Generate a realistic job title for a tech company. "
+    "The title should be related to these skills:\n"
+    "- {skills}\n\n"
+    "Return only the job title of four words or less, nothing else."
+)
+
+DESCRIPTION_PROMPT = (
+    "Write a short, realistic job description for the position titled: '{title}'.\n"
+    "The job should require skills from this list (but don't list them explicitly):\n"
+    "- {skills}\n\n"
+    "Focus on responsibilities and qualifications. Keep it concise (2-3 sentences)."
+    "Return only the description, nothing else."
+)
+
+SKILLS_PROMPT = (
+    "Based on this job title and description:\n\n"
+    "Title: {title}\n"
+    "Description: {description}\n\n"
+    "Select 3-5 skills from this list that are most relevant. "
+    "Return as a JSON array of strings.\n"
+    "Available skills: {skills}\n\n"
+    "Return as JSON only and nothing else."
+)
+
+JOB_PROMPT = (
+    "Generate a realistic job listing for a tech company, "
+    "related to these skills:\n"
+    "- {skills}\n\n"
+    'Return a JSON object with the keys "title", "description" and "skills":\n'
+    '- "title": a job title of four words or less\n'
+    '- "description": 2-3 sentences on responsibilities and qualifications, '
+    "without listing the skills explicitly\n"
+    '- "skills": an array of the 3-5 most relevant skills from this list: '
+    "{all_skills}\n\n"
+    "Return as JSON only and nothing else."
+)
+
+
+def make_job_id() -> str:
+    return "".join(random.choices(string.ascii_uppercase + string.digits, k=8))
+
 
 class JobStore(JsonListStore[Dict[str, Any]]):
+    _index_field = "job_id"
+
     def __init__(self, json_file: str = None):
         if json_file is None:
             json_file = Path(__file__).parent / "jobs.json"
         super().__init__(json_file)
 
-    def update_job_availability(
+    async def update_job_availability(
         self, job_id: str, filled: bool, candidate_id: Optional[str] = None
     ) -> bool:
         logger.info(
-            f"Updating job {job_id} availability to {'filled' if filled else 'unfilled'}"
+            "Updating job %s availability to %s",
+            job_id,
+            "filled" if filled else "unfilled",
         )
         job = self.get_single("job_id", job_id)
 
         if not job:
-            logger.warning(f"Job {job_id} not found for update")
+            logger.warning("Job %s not found for update", job_id)
             return False
 
         old_status = job.get("status", "unknown")
@@ -40,162 +86,173 @@ class JobStore(JsonListStore[Dict[str, Any]]):
             removed_candidates = len(job.get("candidate_ids", []))
             job["candidate_ids"] = []
             logger.info(
-                f"Job {job_id} marked as unfilled. Removed {removed_candidates} candidates"
+                "Job %s marked as unfilled. Removed %s candidates",
+                job_id,
+                removed_candidates,
             )
         else:
             if "candidate_ids" not in job:
                 job["candidate_ids"] = []
             if candidate_id and candidate_id not in job["candidate_ids"]:
                 job["candidate_ids"].append(candidate_id)
-                logger.info(f"Added candidate {candidate_id} to job {job_id}")
+                logger.info("Added candidate %s to job %s", candidate_id, job_id)
 
-        self.save()
-        logger.info(f"Updated job {job_id} status from {old_status} to {job['status']}")
+        await self.asave()
+        logger.info(
+            "Updated job %s status from %s to %s", job_id, old_status, job["status"]
+        )
         return True
 
     async def async_generate_fake_jobs(self, n: int) -> None:
-        self.data.extend(await generate_fake_jobs(n, "candidates.json"))
-        self.save()
+        # Save each job as it arrives so a slow or failed call doesn't hold
+        # back (or lose) the ones already generated
+        async for job in iter_fake_jobs(n, "candidates.json"):
+            while job["job_id"] in self._index:
+                job["job_id"] = make_job_id()
+            self.save_append(job)
 
 
 async def generate_fake_jobs(
     n: int, candidates_json: str = "candidates.json", chat_client_type: str = "ollama"
 ) -> list[dict[str, Any]]:
-    logger.info(f"Generating {n} fake jobs using {candidates_json}")
+    return [job async for job in iter_fake_jobs(n, candidates_json, chat_client_type)]
+
+
+async def iter_fake_jobs(
+    n: int, candidates_json: str = "candidates.json", chat_client_type: str = "ollama"
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yields fake jobs in the order they finish generating."""
+    logger.info("Generating %s fake jobs using %s", n, candidates_json)
 
     try:
         from chat_client import get_chat_client
 
         chat_client = get_chat_client(chat_client_type)
-        logger.info(f"Successfully initialized chat client: {chat_client_type}")
+        logger.info("Successfully initialized chat client: %s", chat_client_type)
     except Exception as e:
-        logger.error(f"Failed to initialize chat client: {e}")
-        return []
+        logger.error("Failed to initialize chat client: %s", e)
+        return
 
     candidate_skills: Set[str] = set()
     if os.path.exists(candidates_json):
         try:
-            candidates = load_json_file(candidates_json)
+            candidates = load_json_file_cached(candidates_json)
             for candidate in candidates:
                 if "skills" in candidate and isinstance(candidate["skills"], list):
                     candidate_skills.update(s.lower() for s in candidate["skills"])
-            logger.info(f"Loaded {len(candidate_skills)} unique skills from candidates")
+            logger.info(
+                "Loaded %s unique skills from candidates", len(candidate_skills)
+            )
         except Exception as e:
-            logger.error(f"Failed to load candidate skills: {e}", exc_info=True)
+            logger.error("Failed to load candidate skills: %s", e, exc_info=True)
     else:
-        logger.warning(f"Candidates file {candidates_json} not found")
+        logger.warning("Candidates file %s not found", candidates_json)
+
+    skills_tuple = tuple(candidate_skills)
+    skills_csv = ", ".join(sorted(candidate_skills))
 
     async def get_title():
         skills_sample = "\n- ".join(
-            random.sample(list(candidate_skills), min(5, len(candidate_skills)))
-        )
-        prompt = (
-            "Generate a realistic job title for a tech company. "
-            "The title should be related to these skills:\n"
-            f"- {skills_sample}\n\n"
-            "Return only the job title of four words or less, nothing else."
+            random.sample(skills_tuple, min(5, len(skills_tuple)))
         )
+        prompt = TITLE_PROMPT.format(skills=skills_sample)
         try:
             messages = [{"role": "user", "content": prompt}]
             logger.info("Generating title...")
             resp = await chat_client.get_completion(messages)
             title = resp["text"].strip()
-            logger.info(f"Generated title: {title}")
+            logger.info("Generated title: %s", title)
             return title
         except Exception as e:
             logger.warning(
-                f"Failed to get title from chat_client: {e}. Using random title."
-            )
-            return (
-                random.choice(list(candidate_skills))
-                if candidate_skills
-                else "Software Engineer"
+                "Failed to get title from chat_client: %s. Using random title.", e
             )
+            return random.choice(skills_tuple) if skills_tuple else "Software Engineer"
 
     async def get_description(title):
         skills_sample = "\n- ".join(
-            random.sample(list(candidate_skills), min(5, len(candidate_skills)))
-        )
-        prompt = (
-            f"Write a short, realistic job description for the position titled: '{title}'.\n"
-            "The job should require skills from this list (but don't list them explicitly):\n"
-            f"- {skills_sample}\n\n"
-            "Focus on responsibilities and qualifications. Keep it concise (2-3 sentences)."
-            "Return only the description, nothing else."
+            random.sample(skills_tuple, min(5, len(skills_tuple)))
         )
+        prompt = DESCRIPTION_PROMPT.format(title=title, skills=skills_sample)
         try:
             messages = [{"role": "user", "content": prompt}]
-            logger.info(f"Generating description for title: {title}")
+            logger.info("Generating description for title: %s", title)
             resp = await chat_client.get_completion(messages)
             description = resp["text"].strip()
-            logger.info(f"Generated description for {title}")
+            logger.info("Generated description for %s", title)
             return description
         except Exception as e:
             logger.warning(
-                f"Failed to get description from chat_client: {e}. Using static description."
+                "Failed to get description from chat_client: %s. Using static description.",
+                e,
             )
             return f"Description for {title}"
 
     async def get_skills(title, description):
-        if not candidate_skills:
+        if not skills_tuple:
             default_skills = ["Python", "JavaScript", "Problem Solving"]
             logger.info("No candidate skills found, using default skills")
             return default_skills
 
         try:
-            logger.info(f"Generating skills for: {title}")
-            prompt = (
-                "Based on this job title and description:\n\n"
-                f"Title: {title}\n"
-                f"Description: {description}\n\n"
-                "Select 3-5 skills from this list that are most relevant. "
-                "Return as a JSON array of strings.\n"
-                f"Available skills: {', '.join(sorted(candidate_skills))}\n\n"
-                "Return as JSON only and nothing else."
+            logger.info("Generating skills for: %s", title)
+            prompt = SKILLS_PROMPT.format(
+                title=title, description=description, skills=skills_csv
             )
             messages = [{"role": "user", "content": prompt}]
             resp = await chat_client.get_completion(messages)
             parsed = parse_json_from_response(resp["text"])
-            logger.info(f"Generated skills for {title}: {pretty_repr(parsed)}")
+            logger.info("Generated skills for %s", title)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Skills: %s", pretty_repr(parsed))
             return parsed
         except Exception as e:
             logger.warning(
-                f"Failed to get skills from chat_client: {e}. Using random skills."
+                "Failed to get skills from chat_client: %s. Using random skills.", e
             )
-            num_skills = random.randint(3, min(5, len(candidate_skills)))
-            return random.sample(list(candidate_skills), num_skills)
-
-    logger.info(f"Starting to generate {n} job listings")
-    tasks = []
-    for _ in range(n):
-        job_id = "".join(random.choices(string.ascii_uppercase + string.digits, k=8))
-        filled = False
-        employee_id = (
-            "".join(random.choices(string.ascii_uppercase + string.digits, k=6))
-            if filled
-            else None
-        )
-        tasks.append((job_id, filled, employee_id))
+            num_skills = random.randint(3, min(5, len(skills_tuple)))
+            return random.sample(skills_tuple, num_skills)
 
-    logger.info("Generating job titles...")
-    titles = await asyncio.gather(*[get_title() for _ in range(n)])
-    logger.info(f"Generated {len(titles)} titles")
-
-    logger.info("Generating job descriptions...")
-    descriptions = await asyncio.gather(*[get_description(title) for title in titles])
-    logger.info(f"Generated {len(descriptions)} descriptions")
-
-    logger.info("Generating required skills...")
-    skills = await asyncio.gather(
-        *[get_skills(title, desc) for title, desc in zip(titles, descriptions)]
-    )
-    logger.info(f"Generated skills for {len(skills)} jobs")
+    async def get_job() -> Optional[Dict[str, Any]]:
+        """Asks for title, description and skills in a single call."""
+        if not skills_tuple:
+            return None
+        skills_sample = "\n- ".join(
+            random.sample(skills_tuple, min(5, len(skills_tuple)))
+        )
+        prompt = JOB_PROMPT.format(skills=skills_sample, all_skills=skills_csv)
+        try:
+            messages = [{"role": "user", "content": prompt}]
+            logger.info("Generating job...")
+            resp = await chat_client.get_completion(messages)
+            parsed = parse_json_from_response(resp["text"])
+        except Exception as e:
+            logger.warning("Failed to get job from chat_client: %s", e)
+            return None
+        if (
+            not isinstance(parsed, dict)
+            or not isinstance(parsed.get("title"), str)
+            or not isinstance(parsed.get("description"), str)
+            or not isinstance(parsed.get("skills"), list)
+        ):
+            logger.warning("Malformed job from chat_client, generating in steps")
+            return None
+        return parsed
 
-    jobs = []
-    for (job_id, filled, employee_id), title, description, job_skills in zip(
-        tasks, titles, descriptions, skills
-    ):
-        job = {
+    async def make_job(semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        async with semaphore:
+            job = await get_job()
+            if job:
+                title = job["title"].strip()
+                description = job["description"].strip()
+                job_skills = job["skills"]
+            else:
+                title = await get_title()
+                description = await get_description(title)
+                job_skills = await get_skills(title, description)
+        job_id = make_job_id()
+        logger.info("Created job: %s - %s", job_id, title)
+        return {
             "job_id": job_id,
             "title": title,
             "description": description,
@@ -203,11 +260,15 @@ async def generate_fake_jobs(
             "status": "unfilled",
             "candidate_ids": [],
         }
-        jobs.append(job)
-        logger.info(f"Created job: {job_id} - {title}")
 
-    logger.info(f"Successfully generated {len(jobs)} jobs")
-    return jobs
+    # One LLM call per job (falling back to title -> description -> skills),
+    # with up to LLM_MAX_INFLIGHT jobs in flight at once
+    logger.info("Starting to generate %s job listings", n)
+    semaphore = asyncio.Semaphore(int(os.getenv("LLM_MAX_INFLIGHT", "16")))
+    for job in asyncio.as_completed([make_job(semaphore) for _ in range(n)]):
+        yield await job
+
+    logger.info("Successfully generated %s jobs", n)
 
 
 if __name__ == "__main__":
@@ -1,6 +1,11 @@
-import json
+import asyncio
+import functools
+import hashlib
+import os
+import tempfile
 from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
 
+import orjson
 from path import Path
 
 T = TypeVar("T")
@@ -10,92 +15,425 @@ def load_json_file(
     filepath: Union[str, Path], model: Type[T] = None
 ) -> Union[dict, list, T]:
     filepath = Path(filepath)
-    if not filepath.exists():
-        raise FileNotFoundError(f"File not found: {filepath}")
+    # One read instead of separate exists/stat/open calls
+    try:
+        content = filepath.bytes()
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {filepath}") from None
 
-    if filepath.stat().st_size == 0:
-        return [] if model is None else []
+    if not content:
+        return []
 
-    with open(filepath, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = orjson.loads(content)
 
     if model is not None:
         if isinstance(data, list):
-            return [model.model_validate(item) for item in data]
+            return _list_adapter(model).validate_python(data)
         return model.model_validate(data)
     return data
 
 
+@functools.lru_cache(maxsize=64)
+def _list_adapter(model: Type[T]):
+    # Validates a whole list in one pydantic-core call
+    from pydantic import TypeAdapter
+
+    return TypeAdapter(List[model])
+
+
+def load_json_file_cached(filepath: Union[str, Path]) -> Union[dict, list]:
+    """Like load_json_file, but reuses the parsed data until the file changes.
+
+    The result is shared between callers, so treat it as read-only.
+    """
+    filepath = Path(filepath).absolute()
+    return _load_json_file_at(filepath, *get_file_stat(filepath))
+
+
+@functools.lru_cache(maxsize=32)
+def _load_json_file_at(filepath: Path, mtime_ns: int, size: int) -> Union[dict, list]:
+    return load_json_file(filepath)
+
+
+def _json_default(obj: Any) -> Any:
+    # Lets orjson serialize pydantic models wherever they sit in the data
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+# Content hash and (mtime_ns, size) of the last save_json_file write per path
+_last_written: Dict[Path, tuple] = {}
+
+
 def save_json_file(
     filepath: Union[str, Path],
     data: Any,
-    indent: int = 2,
+    indent: Optional[int] = 2,
 ) -> None:
     filepath = Path(filepath)
-    if filepath.parent:
-        filepath.parent.makedirs_p()
+    make_parent_dir(filepath)
+
+    if hasattr(data, "model_dump_json"):
+        # pydantic serializes a model straight to JSON without the dict detour
+        content = data.model_dump_json(indent=indent).encode()
+    else:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            # orjson only supports two-space indentation
+            option |= orjson.OPT_INDENT_2
+        content = orjson.dumps(data, default=_json_default, option=option)
+
+    # Skip the write if the file still holds exactly what we last wrote there
+    key = filepath.absolute()
+    digest = hashlib.blake2b(content, digest_size=16).digest()
+    last = _last_written.get(key)
+    if last and last[0] == digest:
+        try:
+            if get_file_stat(filepath) == last[1]:
+                return
+        except OSError:
+            pass
+
+    write_file_atomic(filepath, content)
+    _last_written[key] = (digest, get_file_stat(filepath))
+
+
+# Directories already made, so repeated saves skip the makedirs syscalls
+_known_dirs = set()
+
+
+def make_parent_dir(filepath: Path) -> None:
+    parent = filepath.parent
+    if parent and parent not in _known_dirs:
+        parent.makedirs_p()
+        _known_dirs.add(parent)
+
+
+def _get_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once at import, as os.umask can only be queried by setting it
+_UMASK = _get_umask()
+
+
+def write_file_atomic(filepath: Union[str, Path], content: bytes) -> None:
+    # Write to a temp file and swap it in, so readers never see a partial file
+    filepath = Path(filepath)
+    try:
+        mode = os.stat(filepath).st_mode & 0o7777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    try:
+        temp_file = _open_temp_file(filepath)
+    except FileNotFoundError:
+        # The directory was removed after make_parent_dir cached it
+        _known_dirs.discard(filepath.parent)
+        make_parent_dir(filepath)
+        temp_file = _open_temp_file(filepath)
+    with temp_file as f:
+        try:
+            # Temp files are created 0600, so keep the mode a plain open() would give
+            os.chmod(f.name, mode)
+            f.write(content)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, filepath)
+
+
+def _open_temp_file(filepath: Path):
+    return tempfile.NamedTemporaryFile(
+        "wb",
+        dir=filepath.parent or ".",
+        prefix=f"{filepath.name}.",
+        suffix=".tmp",
+        delete=False,
+    )
+
 
-    with open(filepath, "w", encoding="utf-8") as f:
-        if hasattr(data, "model_dump"):
-            data = data.model_dump()
-        elif isinstance(data, list) and data and hasattr(data[0], "model_dump"):
-            data = [item.model_dump() for item in data]
+def load_json_lines_file(filepath: Union[str, Path]) -> List[Any]:
+    items = []
+    with open(filepath, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                items.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                # An append cut short by a crash; the other records are intact
+                print(f"Warning: skipping truncated line in {filepath}")
+    return items
 
-        json.dump(data, f, indent=indent)
+
+def dumps_json_line(item: Any) -> bytes:
+    return (
+        orjson.dumps(item, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+        + b"\n"
+    )
+
+
+def save_json_lines_file(filepath: Union[str, Path], items: List[Any]) -> None:
+    filepath = Path(filepath)
+    make_parent_dir(filepath)
+    write_file_atomic(filepath, b"".join(dumps_json_line(item) for item in items))
+
+
+def append_json_lines_file(filepath: Union[str, Path], item: Any) -> None:
+    line = dumps_json_line(item)
+    with open(filepath, "ab+") as f:
+        # Start a fresh line if a torn write left the last one unterminated
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                line = b"\n" + line
+        f.write(line)
+
+
+def get_file_stat(filepath: Union[str, Path]) -> tuple:
+    stat = os.stat(filepath)
+    return stat.st_mtime_ns, stat.st_size
 
 
 T = TypeVar("T", bound=Dict[str, Any])
 
 
 class JsonListStore(Generic[T]):
+    # Subclasses can name a unique field to get O(1) get_single lookups on it
+    _index_field: Optional[str] = None
+    # Store as JSON Lines: new and updated records are appended as lines, and
+    # on load the last line for each _index_field value wins
+    _json_lines = False
+
     def __init__(self, json_file: Union[str, Path]):
         self.json_file = Path(json_file)
         self.lock_file = self.json_file.parent / f"{self.json_file.name}.lock"
         self.data: List[T] = []
+        self._index: Dict[Any, T] = {}
+        # Lazily built {value: [items]} maps for get_list/get_single by field
+        self._groups: Dict[str, Dict[Any, List[T]]] = {}
+        self.is_autosave = False
+        self._dirty = asyncio.Event()
+        # Bumped on every save so clients can cheaply detect changes
+        self.version = 0
+        # (mtime_ns, size) of the file as of our last load/write, to spot
+        # outside edits
+        self._file_stat: Optional[tuple] = None
         if self.json_file and self.json_file.exists():
             self.load()
 
     def load(self, filepath: Union[str, Path] = None) -> None:
+        if filepath is None and self._dirty.is_set():
+            # unsaved changes in memory are newer than the file
+            return
         filepath = Path(filepath) if filepath else self.json_file
         if not filepath:
             self.data = []
+            self._build_field_index()
             return
 
+        n_lines = 0
         try:
             if filepath.exists():
-                self.data = load_json_file(filepath)
+                file_stat = get_file_stat(filepath)
+                if self._json_lines:
+                    lines = load_json_lines_file(filepath)
+                    n_lines = len(lines)
+                    self.data = self._merge_lines(lines)
+                else:
+                    self.data = load_json_file(filepath)
+                if filepath == self.json_file:
+                    self._file_stat = file_stat
             else:
                 self.data = []
         except Exception as e:
             print(f"Error: reading {filepath}: {e}")
             raise
+        self.version += 1
+        self._build_field_index()
+        if filepath == self.json_file and n_lines > 2 * len(self.data):
+            # mostly superseded lines, so compact the log
+            self._write(None, self.data)
+
+    def _merge_lines(self, lines: List[T]) -> List[T]:
+        if not self._index_field:
+            return lines
+        field = self._index_field
+        records = {}
+        for item in lines:
+            records[item[field]] = item
+        return list(records.values())
+
+    def _build_field_index(self) -> None:
+        self._groups = {}
+        if self._index_field:
+            field = self._index_field
+            self._index = {item[field]: item for item in self.data}
+
+    def reload_if_changed(self) -> None:
+        """Reloads only if another process has rewritten the file since we last saw it."""
+        try:
+            file_stat = get_file_stat(self.json_file)
+        except OSError:
+            return
+        if file_stat != self._file_stat:
+            self.load()
 
     def save(self, filepath: Union[str, Path] = None) -> None:
+        self.version += 1
+        # Items may have been edited in place, so lookups are rebuilt on demand
+        self._groups = {}
+        if filepath is None and self.is_autosave:
+            self._dirty.set()
+            return
+        self._write(filepath, self.data)
+
+    def _write(self, filepath: Union[str, Path], data: List[T]) -> None:
         filepath = Path(filepath) if filepath else self.json_file
         if not filepath:
             return
         try:
-            parent = filepath.parent
-            if parent:
-                filepath.parent.makedirs_p()
-            save_json_file(filepath, self.data)
+            if self._json_lines:
+                save_json_lines_file(filepath, data)
+            else:
+                # Stores are machine-read, so skip the indentation
+                save_json_file(filepath, data, indent=None)
+            if filepath == self.json_file:
+                self._file_stat = get_file_stat(filepath)
         except Exception as e:
             print(f"Error: saving {filepath}: {e}")
             raise
 
+    def save_append(self, item: T) -> None:
+        """Adds item to the store; JSON Lines stores append just that record."""
+        self.append(item)
+        if not self._json_lines or self.is_autosave or not self.json_file.exists():
+            # JSON lists are always rewritten atomically, never patched in place
+            self.save()
+            return
+        self._append_to_file(item)
+
+    def save_item(self, item: T) -> None:
+        """Saves an edit to one record; JSON Lines stores append just that record."""
+        if not self._json_lines or self.is_autosave or not self.json_file.exists():
+            self.save()
+            return
+        self._groups = {}
+        self._append_to_file(item)
+
+    def _append_to_file(self, item: T) -> None:
+        self.version += 1
+        try:
+            append_json_lines_file(self.json_file, item)
+            self._file_stat = get_file_stat(self.json_file)
+        except Exception as e:
+            print(f"Error: appending to {self.json_file}: {e}")
+            raise
+
+    async def asave(self) -> None:
+        """Like save(), but writes the file on a worker thread."""
+        self.version += 1
+        self._groups = {}
+        if self.is_autosave:
+            self._dirty.set()
+            return
+        data = [dict(item) for item in self.data]
+        await asyncio.to_thread(self._write, None, data)
+
+    async def flush(self) -> None:
+        if not self._dirty.is_set():
+            return
+        self._dirty.clear()
+        # Snapshot the records so the writer thread doesn't race mutations
+        data = [dict(item) for item in self.data]
+        await asyncio.to_thread(self._write, None, data)
+
+    async def run_autosave(self, stop_event: asyncio.Event, delay: float = 0.5):
+        """Coalesces save() calls into background writes until stop_event is set.
+
+        While this runs, save() only marks the store as dirty, and a burst of
+        saves within `delay` seconds becomes a single write of the file.
+        """
+        self.is_autosave = True
+        try:
+            while not stop_event.is_set():
+                try:
+                    await asyncio.wait_for(self._dirty.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                # Shutdown cuts the delay short; the flush below still runs
+                try:
+                    await asyncio.wait_for(stop_event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                await self.flush()
+        finally:
+            self.is_autosave = False
+            await self.flush()
+
+    def append(self, item: T) -> None:
+        self.data.append(item)
+        self._add_to_groups([item])
+        if self._index_field:
+            self._index[item[self._index_field]] = item
+
+    def extend(self, items: List[T]) -> None:
+        self.data.extend(items)
+        self._add_to_groups(items)
+        if self._index_field:
+            field = self._index_field
+            self._index.update((item[field], item) for item in items)
+
     def clear(self) -> None:
         self.data = []
+        self._index = {}
+        self._groups = {}
         self.save()
 
+    def _add_to_groups(self, items: List[T]) -> None:
+        # New items don't change existing ones, so built groups can be extended
+        for field, groups in list(self._groups.items()):
+            try:
+                for item in items:
+                    groups.setdefault(item.get(field), []).append(item)
+            except TypeError:
+                del self._groups[field]
+
+    def _get_group(self, field: str, value: Any) -> Optional[List[T]]:
+        """Returns the items whose field equals value, or None if unindexable."""
+        groups = self._groups.get(field)
+        if groups is None:
+            groups = {}
+            try:
+                for item in self.data:
+                    groups.setdefault(item.get(field), []).append(item)
+            except TypeError:
+                # unhashable field values
+                return None
+            self._groups[field] = groups
+        try:
+            return groups.get(value, [])
+        except TypeError:
+            return None
+
     def get_list(self, field: Optional[str] = None, value: Any = None) -> List[T]:
-        self.load()
+        self.reload_if_changed()
         if not field:
             return self.data
-        return [item for item in self.data if item.get(field) == value]
+        group = self._get_group(field, value)
+        if group is None:
+            return [item for item in self.data if item.get(field) == value]
+        return list(group)
 
     def get_single(self, field: str, value: Any) -> Optional[T]:
-        self.load()
-        for item in self.data:
-            if item.get(field) == value:
-                return item
-        return None
+        self.reload_if_changed()
+        if field == self._index_field:
+            return self._index.get(value)
+        group = self._get_group(field, value)
+        if group is None:
+            return next((i for i in self.data if i.get(field) == value), None)
+        return group[0] if group else None
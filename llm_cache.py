@@ -0,0 +1,66 @@
+import hashlib
+import sqlite3
+import time
+from typing import Optional, Union
+
+from path import Path
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split()).lower()
+
+
+class LLMCache:
+    """Content-addressed cache of LLM responses, persisted in sqlite.
+
+    Keys are blake2b hashes of the agent tag, model and prompt, so a repeated
+    prompt within `ttl` seconds returns the stored response instead of making
+    another model round-trip.
+    """
+
+    def __init__(self, db_file: Union[str, Path], ttl: float = 600):
+        self.db_file = Path(db_file)
+        self.ttl = ttl
+        if self.db_file.parent:
+            self.db_file.parent.makedirs_p()
+        self.conn = sqlite3.connect(self.db_file)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache "
+            "(key TEXT PRIMARY KEY, response TEXT, ts REAL)"
+        )
+        self.conn.commit()
+        self.purge_expired()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.blake2b("|".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self.conn.execute(
+            "SELECT response, ts FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row and row[1] > time.time() - self.ttl:
+            return row[0]
+        return None
+
+    def set(self, key: str, response: str) -> None:
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, response, ts) VALUES (?, ?, ?)",
+            (key, response, now),
+        )
+        self.conn.commit()
+        # Sweep at most once per ttl, so expired rows don't pile up
+        if now - self.last_purge > self.ttl:
+            self.purge_expired()
+
+    def purge_expired(self) -> None:
+        self.last_purge = time.time()
+        self.conn.execute(
+            "DELETE FROM llm_cache WHERE ts <= ?", (self.last_purge - self.ttl,)
+        )
+        self.conn.commit()
+
+    def clear(self) -> None:
+        self.conn.execute("DELETE FROM llm_cache")
+        self.conn.commit()
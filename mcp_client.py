@@ -1,11 +1,11 @@
 import asyncio
 import functools
-import json
 import logging
 import sys
-from contextlib import AsyncExitStack
-from typing import Any, Callable, Optional
+from contextlib import AsyncExitStack, aclosing
+from typing import Any, AsyncIterator, Callable, Optional
 
+import orjson
 from mcp import ClientSession
 from mcp.client.sse import sse_client
 from rich.logging import RichHandler
@@ -74,6 +74,7 @@ class MCPClient:
         self.is_async_init = False
         self._session_context = None
         self._streams_context = None
+        self.tools = []
 
     async def check_async_init(self):
         if self.is_async_init:
@@ -90,11 +91,16 @@ class MCPClient:
         self.is_async_init = True
         logger.info("Initialized an MCP-SSE client...")
 
-        self.tools = await self.get_tools()
+        await self.refresh_tools()
         logger.info("Tools:")
         for tool in self.tools:
             name = tool["function"]["name"]
-            logger.info(f"- {name}")
+            logger.info("- %s", name)
+
+    async def refresh_tools(self):
+        """Re-fetches the server's tools; queries otherwise reuse self.tools."""
+        self.tools = await self.get_tools()
+        return self.tools
 
     @async_init_prehook
     async def get_tools(self):
@@ -118,8 +124,11 @@ class MCPClient:
             await self._streams_context.__aexit__(None, None, None)
 
     @async_init_prehook
-    async def process_query(self, query: str) -> str:
-        messages = [{"role": "user", "content": str(query)}]
+    async def process_query(self, query: str, system: Optional[str] = None) -> str:
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": str(query)})
         response = await self.chat_client.get_completion(messages, self.tools)
 
         tool_results = []
@@ -127,14 +136,13 @@ class MCPClient:
 
         if not response.get("tool_calls"):
             if response.get("text"):
-                final_text.append(str(response["text"]))
+                final_text.append(response["text"])
         else:
             for tool_call in response["tool_calls"]:
                 tool_name = tool_call["function"]["name"]
-                if isinstance(tool_call["function"]["arguments"], str):
-                    tool_args = json.loads(tool_call["function"]["arguments"])
-                else:
-                    tool_args = tool_call["function"]["arguments"]
+                tool_args = tool_call["function"]["arguments"]
+                if isinstance(tool_args, (str, bytes)):
+                    tool_args = orjson.loads(tool_args)
 
                 result = await self.session.call_tool(tool_name, tool_args)
 
@@ -144,16 +152,34 @@ class MCPClient:
                 messages.append(
                     {"role": "assistant", "content": f"Tool {tool_name} called."}
                 )
-                result_content = str(getattr(result, "content", str(result)))
+                try:
+                    result_content = str(result.content)
+                except AttributeError:
+                    result_content = str(result)
                 messages.append({"role": "user", "content": result_content})
 
                 next_response = await self.chat_client.get_completion(messages=messages)
 
                 if next_response.get("text"):
-                    final_text.append(str(next_response["text"]))
+                    final_text.append(next_response["text"])
 
         return "\n".join(final_text)
 
+    async def process_query_stream(
+        self, query: str, system: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Streams the chat response to a query, without offering any tools.
+
+        Closing the generator early closes the underlying model stream.
+        """
+        messages = []
+        if system:
+            messages.append({"role": "system", "content": system})
+        messages.append({"role": "user", "content": str(query)})
+        async with aclosing(self.chat_client.stream_completion(messages)) as stream:
+            async for chunk in stream:
+                yield chunk
+
 
 async def main():
     logging.basicConfig(
@@ -173,7 +199,7 @@ async def main():
             response = await client.process_query(query)
             print(response)
         except Exception as e:
-            logger.error(f"Error: {str(e)}")
+            logger.error("Error: %s", e)
             print(f"\nError: {str(e)}")
     await client.cleanup()
 
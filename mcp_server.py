@@ -40,6 +40,8 @@ mcp = FastMCP("mvp")
 job_store = JobStore()
 candidate_store = CandidateStore()
 
+CANDIDATE_OMIT_FIELDS = frozenset(("messages", "job_id"))
+
 
 @mcp.tool()
 async def get_candidates() -> list[dict]:
@@ -50,12 +52,11 @@ async def get_candidates() -> list[dict]:
                   about an available candidate. Each candidate dictionary includes
                   details such as candidate_id, name, skills, and availability status.
     """
-    candidates = candidate_store.get_list()
-    candidates = candidates.copy()
-    for candidate in candidates:
-        del candidate["messages"]
-        del candidate["job_id"]
-    return candidates
+    # Project into new dicts rather than deleting keys from the store's records
+    return [
+        {k: v for k, v in candidate.items() if k not in CANDIDATE_OMIT_FIELDS}
+        for candidate in candidate_store.get_list()
+    ]
 
 
 @mcp.tool()
@@ -1,6 +1,7 @@
+import asyncio
 import logging
 import random
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from faker import Faker
 from path import Path
@@ -12,63 +13,92 @@ from json_store import JsonListStore
 
 logger = logging.getLogger(__name__)
 
+MAX_CONCURRENT_REPLIES = 8
 
-def generate_email_from_name(name: str) -> str:
-    name_parts = name.split()
-    first_name = name_parts[0].lower()
-    last_name = name_parts[-1].lower() if len(name_parts) > 1 else ""
+STATUS_TOGGLE = {"Available": "Not Available", "Not Available": "Available"}
 
-    email_format = random.choice(["full_name", "initials"])
-    if email_format == "full_name":
-        email = f"{first_name}_{last_name}@example.org"
-    else:
-        initials = first_name[0] + (last_name[0] if last_name else "")
-        random_number = random.randint(1, 99)
-        email = f"{initials}{random_number}@example.org"
+REPLY_SYSTEM = (
+    "You are {name}, a job candidate. "
+    "Reply politely to the recruiter in 1-3 sentences. "
+    "You are {preference} in this opportunity."
+)
 
-    return email
+REPLY_PROMPT = "Recruiter's message:\nSubject: {subject}\nBody: {body}"
+
+
+def generate_email_from_name(name: str) -> str:
+    name_parts = name.lower().split()
+    first_name = name_parts[0]
+    last_name = name_parts[-1] if len(name_parts) > 1 else ""
+
+    # Half full names, half initials with a number
+    if random.random() < 0.5:
+        return f"{first_name}_{last_name}@example.org"
+    return f"{first_name[0]}{last_name[:1]}{random.randint(1, 99)}@example.org"
+
+
+def make_fake_people(first_id: int, n: int) -> List[Dict[str, Any]]:
+    fake = Faker(use_weighting=False)
+    statuses = tuple(STATUS_TOGGLE)
+    return [
+        {
+            "candidate_id": candidate_id,
+            "name": name,
+            "email": generate_email_from_name(name),
+            "phone": fake.phone_number(),
+            "status": random.choice(statuses),
+        }
+        for candidate_id, name in ((first_id + i, fake.name()) for i in range(n))
+    ]
 
 
 class PeopleStore(JsonListStore[Dict[str, Any]]):
+    _index_field = "candidate_id"
+
     def __init__(self, file_path: str = None):
+        self._max_id = 0
         if file_path is None:
             file_path = Path(__file__).parent / "people.json"
         super().__init__(file_path)
         self.chat_client = get_chat_client("ollama")
         self.email_manager = EmailStore()
 
-    async def _generate_ai_response(
+    def _make_reply_messages(
         self, candidate_name: str, message_type: str, message_content: str
-    ) -> str:
+    ) -> List[Dict[str, str]]:
         interested = random.random() < 0.6
         preference = "interested" if interested else "not interested"
+        system = REPLY_SYSTEM.format(name=candidate_name, preference=preference)
+        prompt = REPLY_PROMPT.format(subject=message_type, body=message_content)
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt},
+        ]
+
+    async def _generate_ai_response(
+        self, candidate_name: str, message_type: str, message_content: str
+    ) -> str:
         response = await self.chat_client.get_completion(
-            [
-                {
-                    "role": "system",
-                    "content": f"""
-                        You are {candidate_name}, a job candidate.
-                        Reply politely to the recruiter in 1-3 sentences.
-                        You are {preference} in this opportunity.
-                        """,
-                },
-                {
-                    "role": "user",
-                    "content": f"Recruiter's message:\nSubject: {message_type}\nBody: {message_content}",
-                },
-            ]
+            self._make_reply_messages(candidate_name, message_type, message_content)
         )
         return response["text"]
 
+    def load(self, filepath: Union[str, Path] = None) -> None:
+        super().load(filepath)
+        self._max_id = max((c.get("candidate_id", 0) for c in self.data), default=0)
+
+    def clear(self) -> None:
+        self._max_id = 0
+        super().clear()
+
     def _get_next_id(self) -> int:
-        if not self.data:
-            return 1
-        return max(c.get("candidate_id", 0) for c in self.data) + 1
+        self._max_id += 1
+        return self._max_id
 
     def save_candidate(
         self, name: str, email: str, phone: str, status: str
     ) -> Dict[str, Any]:
-        self.load()
+        self.reload_if_changed()
         new_candidate = {
             "candidate_id": self._get_next_id(),
             "name": name,
@@ -76,25 +106,30 @@ class PeopleStore(JsonListStore[Dict[str, Any]]):
             "phone": phone,
             "status": status,
         }
-        self.data.append(new_candidate)
-        self.save()
+        self.save_append(new_candidate)
         return new_candidate
 
-    def generate_fake_people(self, n: int = 5):
-        self.load()
-        fake = Faker()
-        for _ in range(n):
-            name = fake.name()
-            candidate = {
-                "candidate_id": self._get_next_id(),
-                "name": name,
-                "email": generate_email_from_name(name),
-                "phone": fake.phone_number(),
-                "status": random.choice(["Available", "Not Available"]),
-            }
-            self.data.append(candidate)
+    def generate_fake_people(self, n: int = 5) -> List[Dict[str, Any]]:
+        self.reload_if_changed()
+        first_id = self._max_id + 1
+        self._max_id += n
+        new_candidates = make_fake_people(first_id, n)
+        self.extend(new_candidates)
         self.save()
-        logger.info(f"Generated {n} new candidates!")
+        logger.info("Generated %s new candidates!", n)
+        return new_candidates
+
+    async def async_generate_fake_people(self, n: int = 5) -> List[Dict[str, Any]]:
+        """Like generate_fake_people, but runs Faker on a worker thread."""
+        self.reload_if_changed()
+        # Reserve the ids up front so concurrent calls can't collide
+        first_id = self._max_id + 1
+        self._max_id += n
+        new_candidates = await asyncio.to_thread(make_fake_people, first_id, n)
+        self.extend(new_candidates)
+        self.save()
+        logger.info("Generated %s new candidates!", n)
+        return new_candidates
 
     def update_status(
         self, candidate_id: int, new_status: str
@@ -110,12 +145,13 @@ class PeopleStore(JsonListStore[Dict[str, Any]]):
         updated_count = 0
         for candidate in self.get_list():
             if random.random() < change_probability:
-                old_status = candidate["status"]
-                candidate["status"] = (
-                    "Available" if old_status == "Not Available" else "Not Available"
+                candidate["status"] = STATUS_TOGGLE.get(
+                    candidate["status"], "Not Available"
                 )
                 logger.info(
-                    f"Status Update: {candidate['name']} is now {candidate['status']}"
+                    "Status Update: %s is now %s",
+                    candidate["name"],
+                    candidate["status"],
                 )
                 updated_count += 1
         if updated_count > 0:
@@ -123,8 +159,8 @@ class PeopleStore(JsonListStore[Dict[str, Any]]):
         return updated_count
 
     async def poll_and_reply_to_emails(self) -> int:
-        self.load()
-        replied_count = 0
+        self.reload_if_changed()
+        to_reply = []
         for email in self.email_manager.get_list():
             if email["response"] is None and not email["read"]:
                 candidate = self.get_single("candidate_id", email["candidate_id"])
@@ -134,16 +170,34 @@ class PeopleStore(JsonListStore[Dict[str, Any]]):
                 self.email_manager.mark_email_as_read(email["email_id"])
 
                 if random.random() < 0.7:
-                    reply = await self._generate_ai_response(
-                        candidate["name"], email["subject"], email["body"]
-                    )
-                    self.email_manager.save_response(email["email_id"], reply)
-                    replied_count += 1
-                    logger.info(
-                        f"Auto-reply: {candidate['name']} replied\n---\n{reply}\n---"
-                    )
+                    to_reply.append((email, candidate))
                 else:
-                    logger.info(f"{candidate['name']} ignored '{email['subject']}'")
+                    logger.info("%s ignored '%s'", candidate["name"], email["subject"])
+
+        # The LLM round trips dominate a poll, so run them as one batch
+        responses = await self.chat_client.get_completion_batch(
+            [
+                self._make_reply_messages(
+                    candidate["name"], email["subject"], email["body"]
+                )
+                for email, candidate in to_reply
+            ],
+            max_concurrency=MAX_CONCURRENT_REPLIES,
+        )
+        replies = [r if isinstance(r, Exception) else r["text"] for r in responses]
+
+        replied_count = 0
+        for (email, candidate), reply in zip(to_reply, replies):
+            if isinstance(reply, Exception):
+                logger.error(
+                    "Failed to generate reply for %s: %s", candidate["name"], reply
+                )
+                continue
+            self.email_manager.save_response(email["email_id"], reply)
+            replied_count += 1
+            logger.info(
+                "Auto-reply: %s replied\n---\n%s\n---", candidate["name"], reply
+            )
 
         return replied_count
 
@@ -1,73 +1,123 @@
 import asyncio
+import functools
 import logging
-import os
+import time
 from contextlib import asynccontextmanager
 from typing import Optional
 
+import orjson
 import uvicorn
-from fastapi import FastAPI, HTTPException, Query, Request
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import Response
 from path import Path
+from pydantic import BaseModel, Field
 from rich.logging import RichHandler
 
+from chat_client import close_chat_clients
 from emails import EmailStore
 from people import PeopleStore
+from utils import ORJSONResponse
 
 logger = logging.getLogger(__name__)
 
-people_manager = PeopleStore()
-email_manager = EmailStore()
+# Loaded in lifespan, so the JSON parse runs off the event loop at startup
+people_manager: Optional[PeopleStore] = None
+email_manager: Optional[EmailStore] = None
+
+# The page is static, so read it once rather than on every request
+INDEX_HTML = (Path(__file__).parent / "people.html").bytes()
+
+
+@functools.lru_cache(maxsize=32)
+def get_candidates_body(version: int, status: Optional[str]) -> bytes:
+    """Serialized /candidates/ response, cached until the store version changes."""
+    if status is None:
+        candidates = people_manager.get_list()
+    else:
+        candidates = people_manager.get_list("status", status)
+    return orjson.dumps(candidates)
+
+
+class CreateCandidateIn(BaseModel):
+    name: str = Field(min_length=1)
+    email: str = Field(min_length=1)
+    phone: str = Field(min_length=1)
+    status: str = "Available"
+
+
+class SendEmailIn(BaseModel):
+    to: str = Field(min_length=1)
+    from_: str = Field(alias="from", min_length=1)
+    subject: str = Field(min_length=1)
+    message: str = Field(min_length=1)
 
 
 async def poll_email_reply_loop(stop_event: asyncio.Event):
     logger.info("Initialise poll_email_reply_loop")
+    next_run = time.monotonic()
     while not stop_event.is_set():
         try:
             replied_count = await people_manager.poll_and_reply_to_emails()
             if replied_count > 0:
                 logger.info(
-                    f"Auto-poll: {replied_count} candidate(s) replied to emails."
+                    "Auto-poll: %s candidate(s) replied to emails.", replied_count
                 )
             else:
                 logger.debug("Auto-poll: No new email replies.")
         except Exception as e:
-            logger.error(f"Error in email reply polling loop: {str(e)}", exc_info=True)
+            logger.error("Error in email reply polling loop: %s", e, exc_info=True)
 
+        # Keep a steady cadence, and run again straight away if the work overran
+        next_run = max(next_run + 2, time.monotonic())
         try:
-            await asyncio.wait_for(stop_event.wait(), timeout=2)
+            await asyncio.wait_for(
+                stop_event.wait(), timeout=next_run - time.monotonic()
+            )
         except asyncio.TimeoutError:
             pass
 
 
 async def status_update_loop(stop_event: asyncio.Event):
     logger.info("Initialise status_update_loop")
+    next_run = time.monotonic()
     while not stop_event.is_set():
         try:
             updated_count = people_manager.update_random_statuses()
             if updated_count > 0:
                 logger.info(
-                    f"Status update: Updated {updated_count} candidate(s) status."
+                    "Status update: Updated %s candidate(s) status.", updated_count
                 )
             else:
                 logger.debug("Status update: No status updates needed.")
         except Exception as e:
-            logger.error(f"Error in status update loop: {str(e)}", exc_info=True)
+            logger.error("Error in status update loop: %s", e, exc_info=True)
 
+        next_run = max(next_run + 10, time.monotonic())
         try:
-            await asyncio.wait_for(stop_event.wait(), timeout=10)
+            await asyncio.wait_for(
+                stop_event.wait(), timeout=next_run - time.monotonic()
+            )
         except asyncio.TimeoutError:
             pass
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    global people_manager, email_manager
     logger.info("Starting application...")
+    people_manager = await asyncio.to_thread(PeopleStore)
+    # Share the store PeopleStore polls, so both see the same in-memory emails
+    email_manager = people_manager.email_manager
+    get_candidates_body.cache_clear()
     stop_event = asyncio.Event()
 
     # Start background tasks
     tasks = [
         asyncio.create_task(poll_email_reply_loop(stop_event)),
         asyncio.create_task(status_update_loop(stop_event)),
+        # Emails are appended line by line, so only people.json gets the
+        # debounced off-thread rewrites
+        asyncio.create_task(people_manager.run_autosave(stop_event)),
     ]
 
     logger.info("Background tasks started")
@@ -78,11 +128,15 @@ async def lifespan(app: FastAPI):
         logger.info("Shutting down application...")
         stop_event.set()
         await asyncio.gather(*tasks, return_exceptions=True)
+        await close_chat_clients()
         logger.info("Background tasks stopped")
 
 
 app = FastAPI(
-    title="Candidate Email Management API", version="1.5.0", lifespan=lifespan
+    title="Candidate Email Management API",
+    version="1.5.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 
@@ -92,10 +146,9 @@ async def read_root():
     Serve the main HTML interface.
 
     Returns:
-        FileResponse: The people.html file
+        Response: The people.html file
     """
-    index_path = os.path.join(os.path.dirname(__file__), "people.html")
-    return FileResponse(index_path)
+    return Response(content=INDEX_HTML, media_type="text/html")
 
 
 @app.post("/generate-candidates/{count}")
@@ -112,7 +165,7 @@ async def generate_candidates(count: int):
     Returns:
         dict: Message and list of generated candidates
     """
-    new_candidates = people_manager.generate_fake_people(count)
+    new_candidates = await people_manager.async_generate_fake_people(count)
     return {
         "message": f"{count} fake candidates generated successfully",
         "candidates": new_candidates,
@@ -120,7 +173,7 @@ async def generate_candidates(count: int):
 
 
 @app.post("/create-candidate")
-async def create_candidate(request: Request):
+async def create_candidate(body: CreateCandidateIn):
     """
     Create a new candidate.
 
@@ -138,18 +191,9 @@ async def create_candidate(request: Request):
     Returns:
         dict: Success message and created candidate data
     """
-    data = await request.json()
-    name = data.get("name")
-    email = data.get("email")
-    phone = data.get("phone")
-    status = data.get("status", "Available")
-
-    if not name or not email or not phone:
-        raise HTTPException(
-            status_code=400, detail="Name, email, and phone are required"
-        )
-
-    candidate = people_manager.save_candidate(name, email, phone, status)
+    candidate = people_manager.save_candidate(
+        body.name, body.email, body.phone, body.status
+    )
 
     return {"message": "Candidate created successfully", "candidate": candidate}
 
@@ -176,21 +220,18 @@ async def list_candidates(
     Returns:
         list: List of candidate dictionaries
     """
-    logger.info(f"Listing candidates status={status}")
+    logger.info("Listing candidates status=%s", status)
     try:
-        if status is None:
-            candidates = people_manager.get_list()
-        else:
-            candidates = people_manager.get_list("status", status)
-        logger.debug(f"Found {len(candidates)} candidates")
-        return candidates
+        people_manager.reload_if_changed()
+        body = get_candidates_body(people_manager.version, status)
+        return Response(content=body, media_type="application/json")
     except Exception as e:
-        logger.error(f"Error listing candidates: {str(e)}", exc_info=True)
+        logger.error("Error listing candidates: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/send-email")
-async def send_email(request: Request):
+async def send_email(body: SendEmailIn):
     """
     Send an email to a candidate.
 
@@ -209,33 +250,22 @@ async def send_email(request: Request):
         dict: Success message and email details
 
     Raises:
-        HTTPException: 404 if candidate not found, 400 for missing fields
+        HTTPException: 404 if candidate not found, 422 for missing fields
     """
-    data = await request.json()
-    candidate_email = data.get("to")
-    recruiter_email = data.get("from")
-    subject = data.get("subject")
-    message = data.get("message")
-
-    if not candidate_email or not recruiter_email or not subject or not message:
-        raise HTTPException(
-            status_code=400,
-            detail="Missing required fields: to, from, subject, message",
-        )
-
+    candidate_email = body.to
     candidate = people_manager.get_single("email", candidate_email)
     if not candidate:
         raise HTTPException(status_code=404, detail="Candidate Not found")
 
     candidate_id = candidate.get("candidate_id")
-    logger.info(f"Candidate {candidate_id} found for email {candidate_email}")
+    logger.info("Candidate %s found for email %s", candidate_id, candidate_email)
 
     email_entry = email_manager.send_email_by_candidate_id(
         candidate_id=candidate_id,
         to_email=candidate_email,
-        from_email=recruiter_email,
-        subject=subject,
-        message=message,
+        from_email=body.from_,
+        subject=body.subject,
+        message=body.message,
     )
 
     return {"message": f"Email sent to {candidate['name']}", "email": email_entry}
@@ -263,7 +293,7 @@ async def list_emails(
     """
     logger.info("Listing emails")
     if candidate_id:
-        result = email_manager.get_list("candidate_id", candidate_id)
+        result = email_manager.get_by_candidate(candidate_id)
     else:
         result = email_manager.get_list()
     return result
@@ -14,17 +14,15 @@ logging.basicConfig(
     handlers=[RichHandler(rich_tracebacks=True)],
 )
 
+# Each stage reads the file the previous one wrote, so they can't overlap.
+# The generators save as they go, so no extra saves are needed.
 people_store = PeopleStore()
 people_store.clear()
 people_store.generate_fake_people(5)
-people_store.save()
 
 candidate_store = CandidateStore()
-candidate_store.clear()
 candidate_store.generate_fake_candidates()
-candidate_store.save()
 
 job_store = JobStore()
 job_store.clear()
 asyncio.run(job_store.async_generate_fake_jobs(5))
-job_store.save()
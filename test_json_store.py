@@ -0,0 +1,106 @@
+import asyncio
+import shutil
+
+import orjson
+import pytest
+
+from json_store import JsonListStore, load_json_file
+
+
+class LinesStore(JsonListStore):
+    _index_field = "id"
+    _json_lines = True
+
+
+def count_lines(filepath) -> int:
+    return len(filepath.read_bytes().splitlines())
+
+
+def test_json_lines_merge_after_reload(tmp_path):
+    json_file = tmp_path / "items.jsonl"
+    store = LinesStore(json_file)
+    store.save_append({"id": 1, "value": "a"})
+    store.save_append({"id": 2, "value": "b"})
+    item = store.get_single("id", 1)
+    item["value"] = "c"
+    store.save_item(item)
+    assert count_lines(json_file) == 3
+
+    reloaded = LinesStore(json_file)
+    assert reloaded.data == [{"id": 1, "value": "c"}, {"id": 2, "value": "b"}]
+
+    # Appends from another store are picked up, with the last line winning
+    store.save_item({"id": 2, "value": "d"})
+    store.save_append({"id": 3, "value": "e"})
+    reloaded.reload_if_changed()
+    assert reloaded.get_single("id", 2)["value"] == "d"
+    assert reloaded.get_list("value", "e") == [{"id": 3, "value": "e"}]
+
+
+def test_json_lines_compacted_on_load(tmp_path):
+    json_file = tmp_path / "items.jsonl"
+    store = LinesStore(json_file)
+    store.save_append({"id": 1, "n": 0})
+    item = store.get_single("id", 1)
+    for n in range(1, 5):
+        item["n"] = n
+        store.save_item(item)
+    assert count_lines(json_file) == 5
+
+    reloaded = LinesStore(json_file)
+    assert reloaded.data == [{"id": 1, "n": 4}]
+    assert count_lines(json_file) == 1
+    assert LinesStore(json_file).data == [{"id": 1, "n": 4}]
+
+
+@pytest.mark.parametrize(
+    "content", [b"", b"[]", b"[]\n", b'[{"id":1}]', b'[\n  {"id": 1}\n]\n']
+)
+def test_save_append_to_json_list(tmp_path, content):
+    json_file = tmp_path / "items.json"
+    json_file.write_bytes(content)
+    expected = (orjson.loads(content) if content else []) + [{"id": 2}, {"id": 3}]
+    store = JsonListStore(json_file)
+    store.save_append({"id": 2})
+    store.save_append({"id": 3})
+    assert load_json_file(json_file) == expected
+    assert JsonListStore(json_file).data == expected
+
+
+@pytest.mark.asyncio
+async def test_autosave_flushes_on_shutdown(tmp_path):
+    json_file = tmp_path / "items.json"
+    store = JsonListStore(json_file)
+    stop_event = asyncio.Event()
+    task = asyncio.create_task(store.run_autosave(stop_event, delay=60))
+    await asyncio.sleep(0)
+
+    store.append({"id": 1})
+    store.save()
+    assert not json_file.exists()
+
+    stop_event.set()
+    await task
+    assert load_json_file(json_file) == [{"id": 1}]
+    assert not store.is_autosave
+
+
+def test_json_lines_truncated_last_line(tmp_path):
+    json_file = tmp_path / "items.jsonl"
+    json_file.write_bytes(b'{"id": 1, "value": "a"}\n{"id": 2, "va')
+    store = LinesStore(json_file)
+    assert store.data == [{"id": 1, "value": "a"}]
+    store.save_append({"id": 3, "value": "c"})
+    assert LinesStore(json_file).data == [
+        {"id": 1, "value": "a"},
+        {"id": 3, "value": "c"},
+    ]
+
+
+def test_save_recreates_removed_dir(tmp_path):
+    json_file = tmp_path / "data" / "items.json"
+    store = JsonListStore(json_file)
+    store.save_append({"id": 1})
+    shutil.rmtree(json_file.parent)
+    store.save_append({"id": 2})
+    assert load_json_file(json_file) == [{"id": 1}, {"id": 2}]
@@ -1,31 +1,113 @@
-import json
+import logging
 import re
+import time
 from datetime import datetime
-from typing import TypeVar
+from typing import Any, Optional, TypeVar
+
+import json5
+import orjson
+from fastapi.responses import JSONResponse
 
 T = TypeVar("T")
 
+logger = logging.getLogger(__name__)
+
+_TOOL_CALL_RE = re.compile(r"\[Calling tool .+ with args \{.*\}\]([\s\S]*)")
+
+# Number of responses that needed the slow JSON5 parser, to monitor LLM drift
+json5_fallback_count = 0
+
 
 def parse_json_from_response(response: str):
-    # Handle case where response starts with a tool call
-    tool_call_match = re.search(
-        r"\[Calling tool .+ with args \{.*\}\]([\s\S]*)", response
-    )
-    if tool_call_match:
-        response = tool_call_match.group(1).strip()
+    global json5_fallback_count
+
+    # Clean JSON is the common case, so try it before looking for wrappers
+    stripped = response.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            return orjson.loads(stripped)
+        except orjson.JSONDecodeError:
+            pass
+
+    # Handle case where response starts with a tool call; the prefix check
+    # skips the regex for the usual response without one
+    if response.startswith("[Calling tool "):
+        tool_call_match = _TOOL_CALL_RE.match(response)
+        if tool_call_match:
+            response = tool_call_match.group(1).strip()
 
     try:
         # Handle code block format
-        json_match = re.search(r"```(?:json\n)?([\s\S]*?)```", response, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1).strip()
-        else:
-            json_str = response.strip()
+        json_str = response
+        start = response.find("```")
+        if start >= 0:
+            end = response.find("```", start + 3)
+            if end >= 0:
+                json_str = response[start + 3 : end]
+                if json_str.startswith("json"):
+                    json_str = json_str[4:]
+        json_str = json_str.strip()
 
-        return json.loads(json_str)
+        try:
+            return orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            result = json5.loads(json_str)
+            json5_fallback_count += 1
+            logger.warning("Parsed response with JSON5 (%s)", json5_fallback_count)
+            return result
     except Exception:
         return response.strip()
 
 
+class ORJSONResponse(JSONResponse):
+    """JSONResponse serialized with orjson instead of the stdlib json module."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
 def _current_timestamp():
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    # Same "%Y-%m-%d %H:%M:%S" format, without strftime's format parsing
+    return datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Fails fast for `reset_timeout` seconds after `max_failures` failures in a row.
+
+    Once the timeout has passed, calls are let through again; a further
+    failure re-opens the circuit immediately.
+    """
+
+    def __init__(self, name: str, max_failures: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.max_failures = max_failures
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        if self.opened_at is None:
+            return False
+        return time.monotonic() - self.opened_at < self.reset_timeout
+
+    def check(self) -> None:
+        if self.is_open:
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.max_failures:
+            if not self.is_open:
+                logger.warning(
+                    "Circuit %s opened after %s failures", self.name, self.failures
+                )
+            self.opened_at = time.monotonic()